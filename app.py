@@ -1,5 +1,8 @@
-from flask import Flask, render_template, request, flash, redirect, url_for, send_from_directory
+from flask import Flask, render_template, request, flash, redirect, url_for, send_from_directory, jsonify, session, make_response, abort
+from flask.json.provider import DefaultJSONProvider
+from jinja2 import FileSystemBytecodeCache
 import os
+import re
 from services.excel_service import ExcelService
 from services.google_sheets_service import GoogleSheetsService
 from services.email_service import EmailService
@@ -7,38 +10,199 @@ from services.product_service import ProductService
 from services.ocr_service import OCRService
 from services.todo_service import TodoService
 from services.carrier_service import CarrierService
-from werkzeug.utils import secure_filename
-from config import GOOGLE_SHEETS_CREDENTIALS_PATH, GOOGLE_SHEETS_SPREADSHEET_ID
+from werkzeug.security import safe_join
+from werkzeug.exceptions import HTTPException, InternalServerError
+from config import GOOGLE_SHEETS_CREDENTIALS_PATH, GOOGLE_SHEETS_SPREADSHEET_ID, IMAGE_EXTENSIONS, OCR_WORKERS, SECRET_KEY, SECRET_KEY_FILE, LOG_LEVEL, PRODUCT_IMAGES_ACCEL_PREFIX
 import logging
-from datetime import datetime
+import time
+import uuid
+import hashlib
+import mimetypes
+from urllib.parse import quote
+from itertools import islice
+from functools import wraps
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from io import BytesIO
 
-logging.basicConfig(level=logging.DEBUG)
+# Use orjson for JSON responses when it is installed
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+    orjson = None
+
+logging.basicConfig(level=LOG_LEVEL)
 logger = logging.getLogger(__name__)
 
+class OrjsonProvider(DefaultJSONProvider):
+    """JSON provider backed by orjson, using Flask's default conversions for other types"""
+    
+    def dumps(self, obj, **kwargs) -> str:
+        return orjson.dumps(obj, default=self.default).decode('utf-8')
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+def load_secret_key() -> bytes:
+    """
+    Return a session key that is stable across restarts and workers.
+    Uses FLASK_SECRET_KEY when set, otherwise a key generated once and kept on disk.
+    """
+    if SECRET_KEY:
+        return SECRET_KEY.encode('utf-8')
+    
+    os.makedirs(os.path.dirname(SECRET_KEY_FILE), exist_ok=True)
+    try:
+        # O_EXCL makes sure concurrently starting workers agree on a single key
+        fd = os.open(SECRET_KEY_FILE, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        # Another worker may still be writing the key, so give it a moment
+        for _ in range(20):
+            with open(SECRET_KEY_FILE, 'rb') as f:
+                key = f.read()
+            if key:
+                return key
+            time.sleep(0.05)
+        raise RuntimeError(f"Secret key file {SECRET_KEY_FILE} is empty")
+    
+    key = os.urandom(24)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(key)
+    logger.info("Generated a new session key at %s", SECRET_KEY_FILE)
+    return key
+
 app = Flask(__name__)
-app.secret_key = os.urandom(24)
-
-# Configure upload folder
-UPLOAD_FOLDER = 'uploads'
-if not os.path.exists(UPLOAD_FOLDER):
-    os.makedirs(UPLOAD_FOLDER)
-
-# Initialize services
-excel_service = ExcelService()
-sheets_service = GoogleSheetsService()
-email_service = EmailService()
-product_service = ProductService()
-ocr_service = OCRService()
-todo_service = TodoService()
-carrier_service = CarrierService()
+app.secret_key = load_secret_key()
+if ORJSON_AVAILABLE:
+    app.json = OrjsonProvider(app)
 
-try:
-    sheets_service.initialize_with_service_account(
-        GOOGLE_SHEETS_CREDENTIALS_PATH,
-        GOOGLE_SHEETS_SPREADSHEET_ID
-    )
-except Exception as e:
-    print(f"Warning: Failed to initialize Google Sheets service: {str(e)}")
+# Templates don't change while the app runs: skip reload checks and reuse compiled bytecode across restarts
+app.config['TEMPLATES_AUTO_RELOAD'] = False
+app.jinja_env.bytecode_cache = FileSystemBytecodeCache()
+# Product images never change in place (a replaced image gets a new filename), so let browsers cache them
+PRODUCT_IMAGE_MAX_AGE = 24 * 60 * 60
+# Absolute, so the nginx hand-off and send_from_directory look in the same place whatever the working directory
+PRODUCT_IMAGES_FOLDER = os.path.join(app.root_path, 'static', 'product_images')
+app.config['SEND_FILE_MAX_AGE_DEFAULT'] = PRODUCT_IMAGE_MAX_AGE
+
+# Largest request body accepted by the text-only carrier forms
+SMALL_FORM_MAX_BYTES = 8 * 1024
+
+# Accepted upload extensions (lowercase, including the dot)
+EXCEL_EXTENSIONS = frozenset({'.xlsx', '.xls'})
+SCREENSHOT_EXTENSIONS = IMAGE_EXTENSIONS | {'.bmp'}
+
+def get_file_extension(filename: str) -> str:
+    """Return the lowercase extension of a filename, including the dot"""
+    return os.path.splitext(filename)[1].lower()
+
+# Bulk input line formats. Every non-blank line matches exactly once: either as a
+# valid record or, through the last alternative, as an invalid line to report.
+# "#3695239669 UK216203823YP" -> (hash, order_number, tracking_number, invalid_line)
+TRACKING_LINE_PATTERN = re.compile(
+    r'^[^\S\n]*(?:(?=(#?))\1(\S+)[^\S\n]+(\S[^\n]*?)|(\S[^\n]*?))[^\S\n]*$', re.MULTILINE)
+# "Product Name | Quantity | Customer Email" -> (product_name, quantity, customer_email, invalid_line)
+BULK_ORDER_LINE_PATTERN = re.compile(
+    r'^[^\S\n]*(?:([^|\n]*?)[^\S\n]*\|[^\S\n]*([^|\n]*?)[^\S\n]*\|[^\S\n]*([^|\n]*?)|(\S[^\n]*?))[^\S\n]*$',
+    re.MULTILINE)
+# Prices in NZD: digits with up to two decimal places, e.g. "25" or "25.50"
+PRICE_PATTERN = re.compile(r'\s*(?:\d+(?:\.\d{0,2})?|\.\d{1,2})\s*')
+
+def parse_price(price_str):
+    """Return a positive price as a float, or None if the string isn't a valid price"""
+    if not price_str or not PRICE_PATTERN.fullmatch(price_str):
+        return None
+    price = float(price_str)
+    return price if price > 0 else None
+
+def create_sheets_service():
+    """Create the Google Sheets service and log in with the service account"""
+    service = GoogleSheetsService()
+    try:
+        service.initialize_with_service_account(
+            GOOGLE_SHEETS_CREDENTIALS_PATH,
+            GOOGLE_SHEETS_SPREADSHEET_ID
+        )
+    except Exception as e:
+        print(f"Warning: Failed to initialize Google Sheets service: {str(e)}")
+    return service
+
+# Initialize services. They don't depend on each other, so build them concurrently:
+# cold start then takes as long as the slowest one (usually the Google login)
+# instead of the sum of all of them
+SERVICE_FACTORIES = {
+    'excel': ExcelService,
+    'sheets': create_sheets_service,
+    'email': EmailService,
+    'product': ProductService,
+    'ocr': OCRService,
+    'todo': TodoService,
+    'carrier': CarrierService,
+}
+with ThreadPoolExecutor(max_workers=len(SERVICE_FACTORIES), thread_name_prefix='startup') as startup_executor:
+    service_futures = {name: startup_executor.submit(factory) for name, factory in SERVICE_FACTORIES.items()}
+excel_service = service_futures['excel'].result()
+sheets_service = service_futures['sheets'].result()
+email_service = service_futures['email'].result()
+product_service = service_futures['product'].result()
+ocr_service = service_futures['ocr'].result()
+todo_service = service_futures['todo'].result()
+carrier_service = service_futures['carrier'].result()
+
+# Screenshot OCR runs on background workers so it doesn't hold up request threads
+ocr_executor = ThreadPoolExecutor(max_workers=OCR_WORKERS, thread_name_prefix='ocr')
+# job_id -> {'status': 'pending' | 'done', 'messages': [(category, message), ...], 'finished_at': monotonic time}
+# Jobs live in this process's memory, so the app must run as a single Gunicorn worker
+# (see gunicorn.conf.py) for the status poll to reach the worker that ran the job
+ocr_jobs = {}
+# Finished jobs whose status is never polled (e.g. the tab was closed) are dropped after this long
+OCR_JOB_TTL_SECONDS = 15 * 60
+
+# Snapshot of the data rendered by index(), keyed on the backing files' stat info
+_index_data_cache = (None, None)
+# Mixed into index() ETags so a restart (new code or templates) invalidates them
+INDEX_ETAG_SALT = uuid.uuid4().hex
+
+def _data_files_signature():
+    """Return the mtime and size of each data file backing the index page"""
+    signature = []
+    for path in (product_service.products_file, product_service.log_file,
+                 todo_service.todos_file, todo_service.log_file,
+                 carrier_service.data_file, carrier_service.log_file):
+        try:
+            stat = os.stat(path)
+            signature.append((stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            signature.append(None)
+    return tuple(signature)
+
+def get_index_data(signature=None):
+    """Load products, todos and carriers for the index page, reusing them until a data file changes"""
+    global _index_data_cache
+    if signature is None:
+        signature = _data_files_signature()
+    cached_signature, data = _index_data_cache
+    if cached_signature != signature:
+        data = {
+            'products': product_service.get_all_products(),
+            'todos': todo_service.get_active_todos(),
+            'todo_stats': todo_service.get_todo_stats(),
+            'carriers': carrier_service.get_all_carriers(),
+            'carrier_stats': carrier_service.get_carrier_stats()
+        }
+        _index_data_cache = (signature, data)
+    return data
+
+def small_form(view):
+    """Reject oversized bodies before the form is parsed; these forms only carry a few short fields"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.content_length is not None and request.content_length > SMALL_FORM_MAX_BYTES:
+            abort(413)
+        return view(*args, **kwargs)
+    return wrapper
 
 def redirect_to_page(page=None):
     """Helper function to redirect to the correct page"""
@@ -46,39 +210,85 @@ def redirect_to_page(page=None):
         return redirect(url_for('index', page=page))
     return redirect(url_for('index'))
 
+def wants_json():
+    """True for the page's fetch() calls, which update the DOM themselves instead of reloading"""
+    return (request.accept_mimetypes.best == 'application/json'
+            or request.headers.get('X-Requested-With') == 'XMLHttpRequest')
+
+def respond(message, category, page=None, status=None, **data):
+    """Report the outcome of a form post: JSON for fetch() callers, flash and redirect otherwise"""
+    if wants_json():
+        ok = category == 'success'
+        return jsonify(ok=ok, message=message, category=category, **data), status or (200 if ok else 400)
+    flash(message, category)
+    return redirect_to_page(page)
+
+def flash_parse_errors(parse_errors, limit=3):
+    """Flash bulk input parse errors as a single message (keeps the session cookie small)"""
+    message = "Skipped lines: " + "; ".join(parse_errors[:limit])
+    if len(parse_errors) > limit:
+        message += f" and {len(parse_errors) - limit} more"
+    flash(message, 'warning')
+
+@app.errorhandler(Exception)
+def handle_unexpected_error(e):
+    """Report errors that escape a form handler the same way the handlers report their own"""
+    # Aborts (404, 413, ...) keep their own responses
+    if isinstance(e, HTTPException):
+        return e
+    
+    logger.error(f"Error in {request.endpoint}: {str(e)}")
+    # Redirecting a failed page load back to the index would loop
+    if request.method != 'POST':
+        return InternalServerError()
+    return respond(f'❌ Error: {str(e)}', 'error', request.form.get('current_page', 'excel-upload'), status=500)
+
 @app.route('/')
 def index():
     # Get current page from query parameter
     current_page = request.args.get('page', 'excel-upload')
     
-    # Get all products to display in the catalog
-    products = product_service.get_all_products()
+    # Get current date for the bulk orders form
+    current_date = date.today().isoformat()
+    
+    # The page only changes with the data files, the selected page and the date, so
+    # browsers can revalidate it with an ETag. Pages carrying one-off content
+    # (flashed messages, a pending OCR job) are never given one.
+    signature = _data_files_signature()
+    etag = None
+    if '_flashes' not in session and 'ocr_job_id' not in session:
+        etag = hashlib.md5(repr((INDEX_ETAG_SALT, signature, current_page, current_date)).encode()).hexdigest()
+        if request.if_none_match.contains(etag):
+            response = app.response_class(status=304)
+            response.set_etag(etag)
+            response.cache_control.no_cache = True
+            return response
+    
+    # Get products, todos and carriers (cached until their data files change)
+    data = get_index_data(signature)
     
     # Check if OCR is available and add installation instructions if needed
     ocr_available = ocr_service.tesseract_available
     ocr_instructions = None if ocr_available else ocr_service.get_installation_instructions()
     
-    # Get current date for the bulk orders form
-    current_date = datetime.now().strftime('%Y-%m-%d')
-    
-    # Get active todos for the notes section
-    todos = todo_service.get_active_todos()
-    todo_stats = todo_service.get_todo_stats()
+    # Pending background screenshot extraction for the page to poll
+    ocr_job_id = session.pop('ocr_job_id', None)
     
-    # Get carriers for the shipping carrier section
-    carriers = carrier_service.get_all_carriers()
-    carrier_stats = carrier_service.get_carrier_stats()
-    
-    return render_template('index.html', 
-                         products=products, 
+    response = make_response(render_template('index.html', 
+                         products=data['products'], 
                          ocr_available=ocr_available, 
                          ocr_instructions=ocr_instructions,
                          current_date=current_date,
-                         todos=todos,
-                         todo_stats=todo_stats,
-                         carriers=carriers,
-                         carrier_stats=carrier_stats,
-                         current_page=current_page)
+                         todos=data['todos'],
+                         todo_stats=data['todo_stats'],
+                         carriers=data['carriers'],
+                         carrier_stats=data['carrier_stats'],
+                         current_page=current_page,
+                         ocr_job_id=ocr_job_id))
+    if etag:
+        response.set_etag(etag)
+        response.cache_control.no_cache = True
+    return response
 
 @app.route('/upload_excel', methods=['POST'])
 def upload_excel():
@@ -96,30 +306,30 @@ def upload_excel():
         flash('No file selected', 'error')
         return redirect_to_page(current_page)
     
-    if not file.filename.endswith(('.xlsx', '.xls')):
+    if get_file_extension(file.filename) not in EXCEL_EXTENSIONS:
         logger.warning(f"Invalid file type: {file.filename}")
         flash('Please upload an Excel file', 'error')
         return redirect_to_page(current_page)
     
+    # Nothing is written to disk, so the original name is only used in messages
+    filename = file.filename
+    
     try:
-        logger.debug(f"Processing file: {file.filename}")
-        # Save the uploaded file
-        filename = secure_filename(file.filename)
-        filepath = os.path.join(UPLOAD_FOLDER, filename)
-        file.save(filepath)
-        logger.debug(f"File saved to: {filepath}")
-        
-        # Process the Excel file
-        order_data, message = excel_service.process_excel_file(filepath)
-        
-        # DEBUG: Print exact data we got from Excel
-        logger.debug("=" * 80)
-        logger.debug("Data from Excel processing:")
-        for idx, order in enumerate(order_data):
-            logger.debug(f"Order {idx + 1}:")
-            logger.debug(f"  order_number: '{order.get('order_number', '')}'")
-            logger.debug(f"  tracking_number: '{order.get('tracking_number', '')}'")
-        logger.debug("=" * 80)
+        logger.debug("Processing file: %s", filename)
+        
+        # Process the Excel file straight from the upload stream. Werkzeug already spools
+        # it in a SpooledTemporaryFile (memory for small files, disk beyond that), so
+        # there is no copy under uploads/ to write or clean up.
+        order_data, message = excel_service.process_excel_file(file.stream)
+        
+        # DEBUG: Print exact data we got from Excel (skipped entirely unless debug logging is on)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("=" * 80)
+            logger.debug("Data from Excel processing:")
+            for idx, order in enumerate(order_data, 1):
+                logger.debug("Order %d: order_number='%s' tracking_number='%s'",
+                             idx, order.get('order_number', ''), order.get('tracking_number', ''))
+            logger.debug("=" * 80)
         
         if not order_data and message:  # If there's an error and no data
             logger.error(f"Excel processing error: {message}")
@@ -133,7 +343,7 @@ def upload_excel():
         
         # Get the initial count of orders
         initial_count = len(order_data)
-        logger.debug(f"Found {initial_count} orders to process")
+        logger.debug("Found %s orders to process", initial_count)
         
         # Append data to Google Sheet (only new entries will be added)
         try:
@@ -144,9 +354,6 @@ def upload_excel():
             flash(f"Error appending data to Google Sheet: {str(e)}", 'error')
             return redirect_to_page(current_page)
         
-        # Clean up the uploaded file
-        os.remove(filepath)
-        
         # Create success message
         success_msg = f"Successfully processed {initial_count} orders from '{filename}'"
         if message:  # If there's additional information about skipped rows
@@ -174,73 +381,51 @@ def bulk_update():
         return redirect_to_page(current_page)
     
     try:
-        # Parse the bulk order text
-        lines = bulk_orders_text.split('\n')
-        order_tracking_pairs = []
+        # Parse the bulk order text (format: #3695239669 UK216203823YP),
+        # removing duplicates as we go (keep last occurrence)
+        unique_pairs = {}
+        total_parsed = 0
         parse_errors = []
         
-        for line_num, line in enumerate(lines, 1):
-            line = line.strip()
-            if not line:
-                continue
-            
-            # Parse format: #3695239669 UK216203823YP
-            parts = line.split(' ', 1)
-            if len(parts) != 2:
-                parse_errors.append(f"Line {line_num}: '{line}' - Invalid format (should be: order_number tracking_number)")
+        for match in TRACKING_LINE_PATTERN.finditer(bulk_orders_text):
+            _, order_number, tracking_number, invalid_line = match.groups()
+            if invalid_line is not None:
+                line_num = bulk_orders_text.count('\n', 0, match.start()) + 1
+                parse_errors.append(f"Line {line_num}: '{invalid_line}' - Invalid format (should be: order_number tracking_number)")
                 continue
             
-            order_number = parts[0].strip()
-            tracking_number = parts[1].strip()
-            
-            # Remove # from order number if present
-            if order_number.startswith('#'):
-                order_number = order_number[1:]
-            
-            if not order_number or not tracking_number:
-                parse_errors.append(f"Line {line_num}: Empty order number or tracking number")
-                continue
-            
-            order_tracking_pairs.append((order_number, tracking_number))
+            unique_pairs[order_number] = tracking_number
+            total_parsed += 1
         
         # Report parsing issues but continue if we have some valid data
         if parse_errors:
             logger.warning(f"Parse errors: {parse_errors}")
-            if len(parse_errors) <= 3:  # Show up to 3 errors
-                for error in parse_errors:
-                    flash(f"Skipped - {error}", 'warning')
-            else:
-                flash(f"Skipped {len(parse_errors)} lines with formatting errors", 'warning')
+            flash_parse_errors(parse_errors)
         
-        if not order_tracking_pairs:
+        if not unique_pairs:
             flash('No valid order/tracking pairs found in the input. Please check the format: #3695239669 UK216203823YP', 'error')
             return redirect_to_page(current_page)
         
-        logger.debug(f"Parsed {len(order_tracking_pairs)} order/tracking pairs")
+        logger.debug("Parsed %s order/tracking pairs", total_parsed)
         
-        # Remove duplicates from input (keep last occurrence)
-        unique_pairs = {}
-        for order_number, tracking_number in order_tracking_pairs:
-            unique_pairs[order_number] = tracking_number
-        
-        final_pairs = list(unique_pairs.items())
-        duplicates_removed = len(order_tracking_pairs) - len(final_pairs)
+        duplicates_removed = total_parsed - len(unique_pairs)
         
         if duplicates_removed > 0:
-            logger.debug(f"Removed {duplicates_removed} duplicate orders from input")
+            logger.debug("Removed %s duplicate orders from input", duplicates_removed)
             flash(f"Removed {duplicates_removed} duplicate order(s) from input (kept latest)", 'info')
         
-        logger.debug(f"Processing {len(final_pairs)} unique order/tracking pairs")
+        logger.debug("Processing %d unique order/tracking pairs", len(unique_pairs))
         
-        # Show which orders we're about to process
-        order_preview = [pair[0] for pair in final_pairs[:5]]  # Show first 5
-        if len(final_pairs) > 5:
-            logger.debug(f"Processing orders: {', '.join(order_preview)} and {len(final_pairs) - 5} more...")
-        else:
-            logger.debug(f"Processing orders: {', '.join(order_preview)}")
+        # Show which orders we're about to process (only built when debug logging is on)
+        if logger.isEnabledFor(logging.DEBUG):
+            order_preview = ', '.join(islice(unique_pairs, 5))  # Show first 5
+            if len(unique_pairs) > 5:
+                logger.debug("Processing orders: %s and %d more...", order_preview, len(unique_pairs) - 5)
+            else:
+                logger.debug("Processing orders: %s", order_preview)
         
         # Perform bulk update
-        added_count, updated_count, skipped_count = sheets_service.bulk_update_orders(final_pairs)
+        added_count, updated_count, skipped_count = sheets_service.bulk_update_orders(unique_pairs.items())
         
         # Create detailed success message
         message_parts = []
@@ -256,7 +441,7 @@ def bulk_update():
         else:
             success_message = "⚠️ Bulk processing completed with no changes"
         
-        logger.info(f"Bulk update results: {added_count} added, {updated_count} updated, {skipped_count} skipped")
+        logger.info("Bulk update results: %s added, %s updated, %s skipped", added_count, updated_count, skipped_count)
         flash(success_message, 'success')
         
     except Exception as e:
@@ -313,11 +498,8 @@ def add_product():
             flash('Please enter a product name', 'error')
             return redirect_to_page(current_page)
         
-        try:
-            price_nzd = float(price_nzd_str)
-            if price_nzd <= 0:
-                raise ValueError("Price must be positive")
-        except (ValueError, TypeError):
+        price_nzd = parse_price(price_nzd_str)
+        if price_nzd is None:
             flash('Please enter a valid price (NZD)', 'error')
             return redirect_to_page(current_page)
         
@@ -332,7 +514,7 @@ def add_product():
         )
         
         flash(f'✅ Successfully added product: {product_name} - NZD ${price_nzd:.2f}', 'success')
-        logger.info(f"Added product: {product_name}")
+        logger.info("Added product: %s", product_name)
         
     except Exception as e:
         logger.error(f"Error adding product: {str(e)}")
@@ -370,18 +552,15 @@ def edit_product():
         update_listing_link = new_listing_link if new_listing_link else None
         
         if new_price_str:
-            try:
-                update_price = float(new_price_str)
-                if update_price <= 0:
-                    raise ValueError("Price must be positive")
-            except (ValueError, TypeError):
+            update_price = parse_price(new_price_str)
+            if update_price is None:
                 flash('Please enter a valid price (NZD)', 'error')
                 return redirect_to_page(current_page)
         
         # Check if image was uploaded
         update_image = None
         if new_image and new_image.filename != '':
-            if not new_image.filename.lower().endswith(('.png', '.jpg', '.jpeg', '.gif')):
+            if get_file_extension(new_image.filename) not in IMAGE_EXTENSIONS:
                 flash('Please upload a valid image file (PNG, JPG, JPEG, GIF)', 'error')
                 return redirect_to_page(current_page)
             update_image = new_image
@@ -416,7 +595,7 @@ def edit_product():
         else:
             flash(f'ℹ️ No changes made to product: {existing_product["name"]}', 'info')
         
-        logger.info(f"Updated product: {updated_product['name']}")
+        logger.info("Updated product: %s", updated_product['name'])
         
     except Exception as e:
         logger.error(f"Error updating product: {str(e)}")
@@ -446,7 +625,7 @@ def delete_product():
         product_service.delete_product(product_id)
         
         flash(f'✅ Successfully deleted product: {product["name"]}', 'success')
-        logger.info(f"Deleted product: {product['name']}")
+        logger.info("Deleted product: %s", product['name'])
         
     except Exception as e:
         logger.error(f"Error deleting product: {str(e)}")
@@ -458,7 +637,19 @@ def delete_product():
 def get_product_image(filename):
     """Serve product images"""
     try:
-        return send_from_directory('static/product_images', filename)
+        if PRODUCT_IMAGES_ACCEL_PREFIX:
+            # Hand the file off to nginx (sendfile) instead of streaming it through a worker
+            image_path = safe_join(PRODUCT_IMAGES_FOLDER, filename)
+            if image_path is None or not os.path.isfile(image_path):
+                return "Image not found", 404
+            response = app.response_class(mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+            response.headers['X-Accel-Redirect'] = f"{PRODUCT_IMAGES_ACCEL_PREFIX}/{quote(filename)}"
+            response.cache_control.public = True
+            response.cache_control.max_age = PRODUCT_IMAGE_MAX_AGE
+            return response
+        
+        return send_from_directory(PRODUCT_IMAGES_FOLDER, filename,
+                                   conditional=True, max_age=PRODUCT_IMAGE_MAX_AGE)
     except Exception as e:
         logger.error(f"Error serving image {filename}: {str(e)}")
         # Return a 404 or placeholder image
@@ -477,22 +668,45 @@ def extract_product():
             return redirect(url_for('index'))
         
         # Validate file type
-        if not screenshot.filename.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.bmp')):
+        file_extension = get_file_extension(screenshot.filename)
+        if file_extension not in SCREENSHOT_EXTENSIONS:
             flash('Please upload a valid image file (PNG, JPG, JPEG, GIF, BMP)', 'error')
             return redirect(url_for('index'))
         
+        # Hand the screenshot to a background OCR worker and return straight away
+        image_bytes = screenshot.read()
+        job_id = uuid.uuid4().hex
+        prune_ocr_jobs()
+        ocr_jobs[job_id] = {'status': 'pending', 'messages': []}
+        ocr_executor.submit(run_extract_product_job, job_id, image_bytes, file_extension[1:])
+        
+        session['ocr_job_id'] = job_id
+        flash('🔍 Analyzing screenshot... products will appear when extraction finishes', 'info')
+        
+    except Exception as e:
+        logger.error(f"Error in product extraction: {str(e)}")
+        flash(f'❌ Error analyzing screenshot: {str(e)}', 'error')
+    
+    return redirect(url_for('index'))
+
+def run_extract_product_job(job_id, image_bytes, file_extension):
+    """Extract products from a screenshot and add them to the catalog (runs on an OCR worker)"""
+    messages = []
+    
+    try:
         # Extract ALL products using the new OCR method
-        all_products = ocr_service.extract_all_products(screenshot)
+        # Product crops are written straight into the catalog's image folder
+        all_products = ocr_service.extract_all_products(BytesIO(image_bytes),
+                                                        image_path_factory=product_service.new_image_path)
         
         if not all_products or (len(all_products) == 1 and all_products[0].get('error')):
             error_msg = all_products[0].get('error', 'Unknown error') if all_products else 'No products found'
-            flash(f'❌ {error_msg}', 'error')
-            return redirect(url_for('index'))
+            messages.append(('error', f'❌ {error_msg}'))
+            return
         
-        # Process each detected product
-        added_count = 0
+        # Validate each detected product, then add them all with a single save
         failed_count = 0
-        product_names = []
+        items = []
         
         for i, product_data in enumerate(all_products):
             if product_data.get('error') or not product_data.get('name'):
@@ -500,58 +714,79 @@ def extract_product():
                 failed_count += 1
                 continue
             
-            try:
-                # Get product details
-                product_name = product_data['name']
-                price_str = product_data['price']
-                image_data = product_data['image_data']
-                
-                # Validate price
-                try:
-                    price_float = float(price_str) if price_str else 0.0
-                except (ValueError, TypeError):
-                    price_float = 0.0
-                
-                if price_float <= 0:
-                    logger.warning(f"Skipping product '{product_name}': invalid price '{price_str}'")
-                    failed_count += 1
-                    continue
-                
-                # Add the product with cropped image
-                if image_data:
-                    product = product_service.add_product_from_bytes(
-                        image_data, product_name, price_float, 'png'
-                    )
-                else:
-                    # Fallback: use original screenshot if cropping failed
-                    screenshot.seek(0)
-                    product = product_service.add_product(screenshot, product_name, price_float)
-                
-                added_count += 1
-                product_names.append(product_name)
-                logger.info(f"Successfully added product: {product_name} - NZD ${price_float:.2f}")
-                
-            except Exception as e:
-                logger.error(f"Failed to add product '{product_data.get('name', 'Unknown')}': {str(e)}")
+            # Get product details
+            product_name = product_data['name']
+            price_str = product_data['price']
+            image_path = product_data['image_path']
+            
+            # Validate price
+            price_float = parse_price(price_str)
+            if price_float is None:
+                logger.warning(f"Skipping product '{product_name}': invalid price '{price_str}'")
+                product_service.discard_image(image_path)
                 failed_count += 1
+                continue
+            
+            if image_path:
+                items.append({'image_path': image_path, 'product_name': product_name, 'price_nzd': price_float})
+            else:
+                # Fallback: use original screenshot if cropping failed
+                items.append({'image_bytes': image_bytes, 'product_name': product_name,
+                              'price_nzd': price_float, 'file_extension': file_extension})
+        
+        try:
+            added_products = product_service.add_products(items)
+        except Exception as e:
+            logger.error(f"Failed to add products: {str(e)}")
+            added_products = []
+        
+        added_count = len(added_products)
+        failed_count += len(items) - added_count
+        product_names = [product['name'] for product in added_products]
+        for product in added_products:
+            logger.info("Successfully added product: %s - NZD $%.2f", product['name'], product['price_nzd'])
         
         # Create summary message
         if added_count > 0:
             if added_count == 1:
-                flash(f'✅ Successfully added 1 product: {product_names[0]}', 'success')
+                messages.append(('success', f'✅ Successfully added 1 product: {product_names[0]}'))
             else:
-                flash(f'✅ Successfully added {added_count} products: {", ".join(product_names)}', 'success')
+                messages.append(('success', f'✅ Successfully added {added_count} products: {", ".join(product_names)}'))
             
             if failed_count > 0:
-                flash(f'⚠️ {failed_count} products could not be added (missing data or errors)', 'warning')
+                messages.append(('warning', f'⚠️ {failed_count} products could not be added (missing data or errors)'))
         else:
-            flash(f'❌ No products were added. {failed_count} products had errors or missing data.', 'error')
+            messages.append(('error', f'❌ No products were added. {failed_count} products had errors or missing data.'))
         
     except Exception as e:
         logger.error(f"Error in product extraction: {str(e)}")
-        flash(f'❌ Error analyzing screenshot: {str(e)}', 'error')
+        messages.append(('error', f'❌ Error analyzing screenshot: {str(e)}'))
+    finally:
+        ocr_jobs[job_id] = {'status': 'done', 'messages': messages, 'finished_at': time.monotonic()}
+
+def prune_ocr_jobs():
+    """Forget finished jobs that have gone unclaimed for longer than OCR_JOB_TTL_SECONDS"""
+    cutoff = time.monotonic() - OCR_JOB_TTL_SECONDS
+    # Copy first: OCR workers add and replace entries concurrently
+    for job_id, job in list(ocr_jobs.items()):
+        if job.get('finished_at', cutoff) < cutoff:
+            ocr_jobs.pop(job_id, None)
+
+@app.route('/extract_product/status/<job_id>')
+def extract_product_status(job_id):
+    """Report the state of a background screenshot extraction"""
+    prune_ocr_jobs()
+    job = ocr_jobs.get(job_id)
+    if job is None:
+        return jsonify({'status': 'unknown'}), 404
     
-    return redirect(url_for('index'))
+    if job['status'] == 'done':
+        # Hand the results to the next page render as regular flash messages
+        ocr_jobs.pop(job_id, None)
+        for category, message in job['messages']:
+            flash(message, category)
+    
+    return jsonify({'status': job['status']})
 
 @app.route('/configure_email', methods=['POST'])
 def configure_email():
@@ -566,7 +801,7 @@ def configure_email():
         # For now, just flash a success message
         # In a real implementation, you'd save these settings to a config file or database
         flash(f'✅ Email configuration saved: {email_address}, scan every {scan_frequency} minutes', 'success')
-        logger.info(f"Email configuration updated: {email_address}")
+        logger.info("Email configuration updated: %s", email_address)
         
     except Exception as e:
         logger.error(f"Error configuring email: {str(e)}")
@@ -589,28 +824,22 @@ def process_bulk_orders():
             return redirect(url_for('index'))
         
         # Parse the new format: Product Name | Quantity | Customer Email
-        lines = bulk_orders_text.split('\n')
         orders = []
         parse_errors = []
         
-        for line_num, line in enumerate(lines, 1):
-            line = line.strip()
-            if not line:
+        for match in BULK_ORDER_LINE_PATTERN.finditer(bulk_orders_text):
+            product_name, quantity_str, customer_email, invalid_line = match.groups()
+            if invalid_line is not None:
+                line_num = bulk_orders_text.count('\n', 0, match.start()) + 1
+                parse_errors.append(f"Line {line_num}: '{invalid_line}' - Invalid format (should be: Product Name | Quantity | Customer Email)")
                 continue
             
-            # Parse format: Product Name | Quantity | Customer Email
-            parts = [part.strip() for part in line.split('|')]
-            if len(parts) != 3:
-                parse_errors.append(f"Line {line_num}: '{line}' - Invalid format (should be: Product Name | Quantity | Customer Email)")
-                continue
-            
-            product_name, quantity_str, customer_email = parts
-            
             try:
                 quantity = int(quantity_str)
                 if quantity <= 0:
                     raise ValueError("Quantity must be positive")
             except (ValueError, TypeError):
+                line_num = bulk_orders_text.count('\n', 0, match.start()) + 1
                 parse_errors.append(f"Line {line_num}: Invalid quantity '{quantity_str}'")
                 continue
             
@@ -624,10 +853,7 @@ def process_bulk_orders():
         
         # Report parsing issues
         if parse_errors:
-            for error in parse_errors[:3]:  # Show up to 3 errors
-                flash(f"Skipped - {error}", 'warning')
-            if len(parse_errors) > 3:
-                flash(f"Skipped {len(parse_errors) - 3} more lines with formatting errors", 'warning')
+            flash_parse_errors(parse_errors)
         
         if not orders:
             flash('No valid orders found in the input. Please check the format: Product Name | Quantity | Customer Email', 'error')
@@ -635,7 +861,7 @@ def process_bulk_orders():
         
         # For now, just flash success (in real implementation, you'd process these orders)
         flash(f'✅ Successfully processed {len(orders)} bulk orders', 'success')
-        logger.info(f"Processed {len(orders)} bulk orders")
+        logger.info("Processed %d bulk orders", len(orders))
         
     except Exception as e:
         logger.error(f"Error processing bulk orders: {str(e)}")
@@ -649,241 +875,187 @@ def add_todo():
     """Add a new todo note"""
     logger.debug("Add todo endpoint called")
     
-    try:
-        title = request.form.get('todo_title', '').strip()
-        description = request.form.get('todo_description', '').strip()
-        current_page = request.form.get('current_page', 'excel-upload')
-        
-        if not title:
-            flash('Todo title is required', 'error')
-            return redirect_to_page(current_page)
-        
-        todo = todo_service.create_todo(title, description)
-        flash(f'✅ Todo "{title}" added successfully', 'success')
-        logger.info(f"Created todo: {title}")
-        
-    except Exception as e:
-        logger.error(f"Error adding todo: {str(e)}")
-        flash(f'❌ Error adding todo: {str(e)}', 'error')
+    current_page = request.form.get('current_page', 'excel-upload')
+    title = request.form.get('todo_title', '').strip()
+    description = request.form.get('todo_description', '').strip()
     
-    return redirect_to_page(current_page)
+    if not title:
+        return respond('Todo title is required', 'error', current_page)
+    
+    todo = todo_service.create_todo(title, description)
+    logger.info("Created todo: %s", title)
+    return respond(f'✅ Todo "{title}" added successfully', 'success', current_page,
+                   todo=todo, stats=todo_service.get_todo_stats())
 
 @app.route('/complete_todo', methods=['POST'])
 def complete_todo():
     """Mark a todo as completed and delete it"""
     logger.debug("Complete todo endpoint called")
     
-    try:
-        todo_id = request.form.get('todo_id', '').strip()
-        current_page = request.form.get('current_page', 'excel-upload')
-        
-        if not todo_id:
-            flash('Invalid todo ID', 'error')
-            return redirect_to_page(current_page)
-        
-        # Get the todo first to show its title in the message
-        todo = todo_service.get_todo_by_id(todo_id)
-        if not todo:
-            flash('Todo not found', 'error')
-            return redirect_to_page(current_page)
-        
-        # Delete the todo (since it's completed)
-        if todo_service.delete_todo(todo_id):
-            flash(f'✅ Todo "{todo["title"]}" completed and removed', 'success')
-            logger.info(f"Completed and deleted todo: {todo['title']}")
-        else:
-            flash('Error completing todo', 'error')
-        
-    except Exception as e:
-        logger.error(f"Error completing todo: {str(e)}")
-        flash(f'❌ Error completing todo: {str(e)}', 'error')
+    current_page = request.form.get('current_page', 'excel-upload')
+    todo_id = request.form.get('todo_id', '').strip()
     
-    return redirect_to_page(current_page)
+    if not todo_id:
+        return respond('Invalid todo ID', 'error', current_page)
+    
+    # Get the todo first to show its title in the message
+    todo = todo_service.get_todo_by_id(todo_id)
+    if not todo:
+        return respond('Todo not found', 'error', current_page, status=404)
+    
+    # Delete the todo (since it's completed)
+    if not todo_service.delete_todo(todo_id):
+        return respond('Error completing todo', 'error', current_page, status=500)
+    
+    logger.info("Completed and deleted todo: %s", todo['title'])
+    return respond(f'✅ Todo "{todo["title"]}" completed and removed', 'success', current_page,
+                   stats=todo_service.get_todo_stats())
 
 @app.route('/edit_todo', methods=['POST'])
 def edit_todo():
     """Edit an existing todo"""
     logger.debug("Edit todo endpoint called")
     
-    try:
-        todo_id = request.form.get('todo_id', '').strip()
-        title = request.form.get('todo_title', '').strip()
-        description = request.form.get('todo_description', '').strip()
-        current_page = request.form.get('current_page', 'excel-upload')
-        
-        if not todo_id or not title:
-            flash('Todo ID and title are required', 'error')
-            return redirect_to_page(current_page)
-        
-        if todo_service.update_todo(todo_id, title, description):
-            flash(f'✅ Todo "{title}" updated successfully', 'success')
-            logger.info(f"Updated todo: {title}")
-        else:
-            flash('Todo not found', 'error')
-        
-    except Exception as e:
-        logger.error(f"Error editing todo: {str(e)}")
-        flash(f'❌ Error editing todo: {str(e)}', 'error')
+    current_page = request.form.get('current_page', 'excel-upload')
+    todo_id = request.form.get('todo_id', '').strip()
+    title = request.form.get('todo_title', '').strip()
+    description = request.form.get('todo_description', '').strip()
     
-    return redirect_to_page(current_page)
+    if not todo_id or not title:
+        return respond('Todo ID and title are required', 'error', current_page)
+    
+    if not todo_service.update_todo(todo_id, title, description):
+        return respond('Todo not found', 'error', current_page, status=404)
+    
+    logger.info("Updated todo: %s", title)
+    return respond(f'✅ Todo "{title}" updated successfully', 'success', current_page,
+                   todo={'id': todo_id, 'title': title, 'description': description})
 
 @app.route('/delete_todo', methods=['POST'])
 def delete_todo():
     """Delete a todo permanently"""
     logger.debug("Delete todo endpoint called")
     
-    try:
-        todo_id = request.form.get('todo_id', '').strip()
-        current_page = request.form.get('current_page', 'excel-upload')
-        
-        if not todo_id:
-            flash('Invalid todo ID', 'error')
-            return redirect_to_page(current_page)
-        
-        # Get the todo first to show its title in the message
-        todo = todo_service.get_todo_by_id(todo_id)
-        if not todo:
-            flash('Todo not found', 'error')
-            return redirect_to_page(current_page)
-        
-        if todo_service.delete_todo(todo_id):
-            flash(f'🗑️ Todo "{todo["title"]}" deleted', 'success')
-            logger.info(f"Deleted todo: {todo['title']}")
-        else:
-            flash('Error deleting todo', 'error')
-        
-    except Exception as e:
-        logger.error(f"Error deleting todo: {str(e)}")
-        flash(f'❌ Error deleting todo: {str(e)}', 'error')
+    current_page = request.form.get('current_page', 'excel-upload')
+    todo_id = request.form.get('todo_id', '').strip()
     
-    return redirect_to_page(current_page)
+    if not todo_id:
+        return respond('Invalid todo ID', 'error', current_page)
+    
+    # Get the todo first to show its title in the message
+    todo = todo_service.get_todo_by_id(todo_id)
+    if not todo:
+        return respond('Todo not found', 'error', current_page, status=404)
+    
+    if not todo_service.delete_todo(todo_id):
+        return respond('Error deleting todo', 'error', current_page, status=500)
+    
+    logger.info("Deleted todo: %s", todo['title'])
+    return respond(f'🗑️ Todo "{todo["title"]}" deleted', 'success', current_page,
+                   stats=todo_service.get_todo_stats())
 
 # Carrier Routes
 @app.route('/add_carrier', methods=['POST'])
+@small_form
 def add_carrier():
     """Add a new shipping carrier"""
     logger.debug("Add carrier endpoint called")
     
-    try:
-        carrier_name = request.form.get('carrier_name', '').strip()
-        etsy_approved = request.form.get('etsy_approved') == 'on'
-        example_tracking = request.form.get('example_tracking', '').strip()
-        current_page = request.form.get('current_page', 'excel-upload')
-        
-        if not carrier_name:
-            flash('Carrier name is required', 'error')
-            return redirect_to_page(current_page)
-        
-        if not example_tracking:
-            flash('Example tracking number is required', 'error')
-            return redirect_to_page(current_page)
-        
-        carrier = carrier_service.add_carrier(carrier_name, etsy_approved, example_tracking)
-        approval_text = "Etsy Approved" if etsy_approved else "Not Etsy Approved"
-        flash(f'✅ Carrier "{carrier_name}" ({approval_text}) added successfully', 'success')
-        logger.info(f"Created carrier: {carrier_name}")
-        
-    except Exception as e:
-        logger.error(f"Error adding carrier: {str(e)}")
-        flash(f'❌ Error adding carrier: {str(e)}', 'error')
+    get = request.form.get
+    current_page = get('current_page', 'excel-upload')
+    carrier_name = get('carrier_name', '').strip()
+    etsy_approved = get('etsy_approved') == 'on'
+    example_tracking = get('example_tracking', '').strip()
     
-    return redirect_to_page(current_page)
+    if not carrier_name:
+        return respond('Carrier name is required', 'error', current_page)
+    
+    if not example_tracking:
+        return respond('Example tracking number is required', 'error', current_page)
+    
+    carrier = carrier_service.add_carrier(carrier_name, etsy_approved, example_tracking)
+    approval_text = "Etsy Approved" if etsy_approved else "Not Etsy Approved"
+    logger.info("Created carrier: %s", carrier_name)
+    return respond(f'✅ Carrier "{carrier_name}" ({approval_text}) added successfully', 'success', current_page,
+                   carrier=dict(carrier), stats=carrier_service.get_carrier_stats())
 
 @app.route('/edit_carrier', methods=['POST'])
+@small_form
 def edit_carrier():
     """Edit an existing carrier"""
     logger.debug("Edit carrier endpoint called")
     
-    try:
-        carrier_id = request.form.get('carrier_id', '').strip()
-        carrier_name = request.form.get('carrier_name', '').strip()
-        etsy_approved = request.form.get('etsy_approved') == 'on'
-        example_tracking = request.form.get('example_tracking', '').strip()
-        alternative_text = request.form.get('alternative_text', '').strip()
-        current_page = request.form.get('current_page', 'excel-upload')
-        
-        if not carrier_id:
-            flash('Carrier ID is required', 'error')
-            return redirect_to_page(current_page)
-        
-        if not carrier_name:
-            flash('Carrier name is required', 'error')
-            return redirect_to_page(current_page)
-        
-        if not example_tracking:
-            flash('Example tracking number is required', 'error')
-            return redirect_to_page(current_page)
-        
-        updated_carrier = carrier_service.update_carrier(
-            carrier_id, carrier_name, etsy_approved, example_tracking, alternative_text
-        )
-        
-        if updated_carrier:
-            approval_text = "Etsy Approved" if etsy_approved else "Not Etsy Approved"
-            flash(f'✅ Carrier "{carrier_name}" ({approval_text}) updated successfully', 'success')
-            logger.info(f"Updated carrier: {carrier_name}")
-        else:
-            flash('Carrier not found', 'error')
-        
-    except Exception as e:
-        logger.error(f"Error editing carrier: {str(e)}")
-        flash(f'❌ Error editing carrier: {str(e)}', 'error')
+    get = request.form.get
+    current_page = get('current_page', 'excel-upload')
+    carrier_id = get('carrier_id', '').strip()
+    carrier_name = get('carrier_name', '').strip()
+    etsy_approved = get('etsy_approved') == 'on'
+    example_tracking = get('example_tracking', '').strip()
+    alternative_text = get('alternative_text', '').strip()
     
-    return redirect_to_page(current_page)
+    if not carrier_id:
+        return respond('Carrier ID is required', 'error', current_page)
+    
+    if not carrier_name:
+        return respond('Carrier name is required', 'error', current_page)
+    
+    if not example_tracking:
+        return respond('Example tracking number is required', 'error', current_page)
+    
+    updated_carrier = carrier_service.update_carrier(
+        carrier_id, carrier_name, etsy_approved, example_tracking, alternative_text
+    )
+    
+    if not updated_carrier:
+        return respond('Carrier not found', 'error', current_page, status=404)
+    
+    approval_text = "Etsy Approved" if etsy_approved else "Not Etsy Approved"
+    logger.info("Updated carrier: %s", carrier_name)
+    return respond(f'✅ Carrier "{carrier_name}" ({approval_text}) updated successfully', 'success', current_page,
+                   carrier=dict(updated_carrier), stats=carrier_service.get_carrier_stats())
 
 @app.route('/delete_carrier', methods=['POST'])
+@small_form
 def delete_carrier():
     """Delete a carrier"""
     logger.debug("Delete carrier endpoint called")
     
-    try:
-        carrier_id = request.form.get('carrier_id', '').strip()
-        current_page = request.form.get('current_page', 'excel-upload')
-        
-        if not carrier_id:
-            flash('Invalid carrier ID', 'error')
-            return redirect_to_page(current_page)
-        
-        # Get carrier details before deletion for the success message
-        carrier = carrier_service.get_carrier_by_id(carrier_id)
-        if not carrier:
-            flash('Carrier not found', 'error')
-            return redirect_to_page(current_page)
-        
-        if carrier_service.delete_carrier(carrier_id):
-            flash(f'🗑️ Carrier "{carrier["carrier_name"]}" deleted successfully', 'success')
-            logger.info(f"Deleted carrier: {carrier['carrier_name']}")
-        else:
-            flash('Error deleting carrier', 'error')
-        
-    except Exception as e:
-        logger.error(f"Error deleting carrier: {str(e)}")
-        flash(f'❌ Error deleting carrier: {str(e)}', 'error')
+    get = request.form.get
+    current_page = get('current_page', 'excel-upload')
+    carrier_id = get('carrier_id', '').strip()
     
-    return redirect_to_page(current_page)
+    if not carrier_id:
+        return respond('Invalid carrier ID', 'error', current_page)
+    
+    # Get carrier details before deletion for the success message
+    carrier = carrier_service.get_carrier_by_id(carrier_id)
+    if not carrier:
+        return respond('Carrier not found', 'error', current_page, status=404)
+    
+    if not carrier_service.delete_carrier(carrier_id):
+        return respond('Error deleting carrier', 'error', current_page, status=500)
+    
+    logger.info("Deleted carrier: %s", carrier['carrier_name'])
+    return respond(f'🗑️ Carrier "{carrier["carrier_name"]}" deleted successfully', 'success', current_page,
+                   stats=carrier_service.get_carrier_stats())
 
 @app.route('/add_alternative_carrier', methods=['POST'])
+@small_form
 def add_alternative_carrier():
     """Add an alternative carrier with custom text"""
     logger.debug("Add alternative carrier endpoint called")
     
-    try:
-        alternative_text = request.form.get('alternative_text', '').strip()
-        current_page = request.form.get('current_page', 'excel-upload')
-        
-        if not alternative_text:
-            flash('Alternative carrier text is required', 'error')
-            return redirect_to_page(current_page)
-        
-        carrier = carrier_service.add_alternative_carrier(alternative_text)
-        flash(f'✅ Alternative carrier "{alternative_text}" added successfully', 'success')
-        logger.info(f"Created alternative carrier: {alternative_text}")
-        
-    except Exception as e:
-        logger.error(f"Error adding alternative carrier: {str(e)}")
-        flash(f'❌ Error adding alternative carrier: {str(e)}', 'error')
+    get = request.form.get
+    current_page = get('current_page', 'excel-upload')
+    alternative_text = get('alternative_text', '').strip()
     
-    return redirect_to_page(current_page)
+    if not alternative_text:
+        return respond('Alternative carrier text is required', 'error', current_page)
+    
+    carrier = carrier_service.add_alternative_carrier(alternative_text)
+    logger.info("Created alternative carrier: %s", alternative_text)
+    return respond(f'✅ Alternative carrier "{alternative_text}" added successfully', 'success', current_page,
+                   carrier=dict(carrier), stats=carrier_service.get_carrier_stats())
 
 if __name__ == '__main__':
     import os
@@ -10,7 +10,9 @@ ALLOWED_SENDERS = [
     "orders@etsy.com",
     "marketplace@etsy.com"
 ]
+ALLOWED_SENDERS_LOWER = tuple(sender.lower() for sender in ALLOWED_SENDERS)
 LAST_SCRAPE_FILE = "data/last_scrape.txt"
+EMAIL_UID_CACHE_FILE = "data/email_uid_cache.json"  # UIDs already processed by the email scraper
 
 # Google Sheets Configuration (Optional)
 GOOGLE_SHEETS_CREDENTIALS_PATH = os.environ.get("GOOGLE_SHEETS_CREDENTIALS_PATH", "credentials.json")
@@ -18,10 +20,19 @@ GOOGLE_SHEETS_SPREADSHEET_ID = os.environ.get("GOOGLE_SHEETS_SPREADSHEET_ID", ""
 
 # File Upload Configuration
 UPLOAD_FOLDER = "uploads"
-ALLOWED_EXTENSIONS = {'xlsx', 'xls', 'png', 'jpg', 'jpeg', 'gif'}
+ALLOWED_EXTENSIONS = frozenset({'xlsx', 'xls', 'png', 'jpg', 'jpeg', 'gif'})
+# Image types accepted for product photos: lowercase extensions including the dot, as from os.path.splitext
+IMAGE_EXTENSIONS = frozenset({'.png', '.jpg', '.jpeg', '.gif'})
 
 # Application Configuration
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()  # Set to DEBUG for verbose request logging
+SECRET_KEY = os.environ.get("FLASK_SECRET_KEY", "")
+SECRET_KEY_FILE = "data/secret_key"  # Generated once when FLASK_SECRET_KEY isn't set
 MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
+# Behind nginx, set to an internal location aliasing static/product_images (e.g. "/protected_images")
+# so product images are served by nginx via X-Accel-Redirect instead of through Python
+PRODUCT_IMAGES_ACCEL_PREFIX = os.environ.get("PRODUCT_IMAGES_ACCEL_PREFIX", "").rstrip("/")
 
 # OCR Configuration - Cloud deployment typically doesn't have tesseract
-TESSERACT_CMD = os.environ.get("TESSERACT_CMD", "/usr/bin/tesseract") 
\ No newline at end of file
+TESSERACT_CMD = os.environ.get("TESSERACT_CMD", "/usr/bin/tesseract") 
+OCR_WORKERS = int(os.environ.get("OCR_WORKERS", "2"))  # Concurrent background screenshot extractions
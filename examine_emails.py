@@ -1,93 +1,61 @@
-import imaplib
 import email
-from email.header import decode_header
 from datetime import datetime, timezone, timedelta
 import os
-from typing import List, Dict
+import re
 from config import (
-    EMAIL_IMAP_SERVER,
-    EMAIL_USERNAME,
-    EMAIL_PASSWORD,
-    ALLOWED_SENDERS
+    ALLOWED_SENDERS,
+    ALLOWED_SENDERS_LOWER
 )
+from services.email_service import EmailService, MESSAGE_QUERY, MESSAGE_BATCH_SIZE, parse_email_date
 
-def decode_email_subject(subject) -> str:
-    """Decode email subject"""
-    if subject is None:
-        return ""
-    
-    decoded_headers = decode_header(subject)
-    subject_parts = []
-    
-    for content, encoding in decoded_headers:
-        if isinstance(content, bytes):
-            if encoding:
-                try:
-                    subject_parts.append(content.decode(encoding))
-                except:
-                    subject_parts.append(content.decode('utf-8', 'ignore'))
-            else:
-                subject_parts.append(content.decode('utf-8', 'ignore'))
-        else:
-            subject_parts.append(content)
-    
-    return " ".join(subject_parts)
-
-def get_email_body(msg) -> str:
-    """Extract email body text"""
-    if msg.is_multipart():
-        for part in msg.walk():
-            if part.get_content_type() == "text/plain":
-                try:
-                    return part.get_payload(decode=True).decode()
-                except:
-                    return part.get_payload(decode=True).decode('utf-8', 'ignore')
-    else:
-        try:
-            return msg.get_payload(decode=True).decode()
-        except:
-            return msg.get_payload(decode=True).decode('utf-8', 'ignore')
-    return ""
+# Finds any allowed sender in a lowercased From header in a single scan
+ALLOWED_SENDER_PATTERN = re.compile('|'.join(map(re.escape, ALLOWED_SENDERS_LOWER)))
+SENDER_BY_LOWER = dict(zip(ALLOWED_SENDERS_LOWER, ALLOWED_SENDERS))
 
 def examine_recent_emails():
     print("Examining recent emails from each sender...")
     
     try:
         # Connect to IMAP server
-        mail = imaplib.IMAP4_SSL(EMAIL_IMAP_SERVER)
-        mail.login(EMAIL_USERNAME, EMAIL_PASSWORD.encode('utf-8').decode('utf-8'))
-        mail.select('INBOX')
+        service = EmailService()
+        mail = service._connect()
         
-        # Search for emails from the last 30 days
+        # Search for emails from the allowed senders in the last 30 days; the server
+        # does the sender matching, so unrelated mail is never downloaded
         date_30_days_ago = (datetime.now() - timedelta(days=30)).strftime("%d-%b-%Y")
-        _, message_numbers = mail.search(None, f'(SINCE "{date_30_days_ago}")')
+        _, message_uids = mail.uid('SEARCH', None, f'SINCE "{date_30_days_ago}"', service._from_any_criteria())
+        uids = list(dict.fromkeys(message_uids[0].split()))
         
         # Store emails by sender
         emails_by_sender = {sender: [] for sender in ALLOWED_SENDERS}
+        # From header (lowercased) -> allowed sender, so each distinct header is matched once
+        sender_matches = {}
+        
+        messages = service._uid_fetch(mail, uids, MESSAGE_QUERY, MESSAGE_BATCH_SIZE)
+        # Stand-in date for messages whose Date header can't be parsed
+        fallback_date = datetime.now(timezone.utc)
         
-        for num in message_numbers[0].split():
+        for uid in uids:
             try:
-                _, msg_data = mail.fetch(num, '(RFC822)')
-                email_body = msg_data[0][1]
-                msg = email.message_from_bytes(email_body)
+                msg = email.message_from_bytes(messages[uid])
                 
                 # Get sender
                 sender = msg.get('from', '').lower()
-                matching_sender = next(
-                    (s for s in ALLOWED_SENDERS if s.lower() in sender),
-                    None
-                )
+                if sender not in sender_matches:
+                    match = ALLOWED_SENDER_PATTERN.search(sender)
+                    sender_matches[sender] = SENDER_BY_LOWER[match.group(0)] if match else None
+                matching_sender = sender_matches[sender]
                 
                 if matching_sender:
                     # Get email details
-                    subject = decode_email_subject(msg.get('subject', ''))
-                    body = get_email_body(msg)
+                    subject = service.decode_email_subject(msg.get('subject', ''))
+                    body = service.get_email_body(msg)
                     date_str = msg.get('date', '')
                     
                     try:
-                        email_date = email.utils.parsedate_to_datetime(date_str)
+                        email_date = parse_email_date(date_str)
                     except:
-                        email_date = datetime.now(timezone.utc)
+                        email_date = fallback_date
                     
                     emails_by_sender[matching_sender].append({
                         'subject': subject,
@@ -0,0 +1,9 @@
+# Gunicorn settings, picked up automatically when gunicorn starts in this directory
+
+# Keep this at 1: background OCR jobs (ocr_jobs in app.py) and the data caches live in the
+# worker's memory, so a second worker would miss jobs started by the first. Scale with threads.
+workers = 1
+# Threaded worker so requests blocked on Google Sheets, IMAP or OCR don't hold up the rest
+worker_class = 'gthread'
+threads = 8
+timeout = 120
@@ -1,36 +1,38 @@
-import json
-import os
 import uuid
-from typing import List, Dict, Optional
+from types import MappingProxyType
+from typing import Callable, List, Dict, Mapping, Optional
 import logging
 
+from services.json_store import JsonLogStore
+
 logger = logging.getLogger(__name__)
 
 class CarrierService:
     def __init__(self, data_file: str = 'data/carriers.json'):
         self.data_file = data_file
+        # Each add/update/delete is appended to the store's log as one JSON line; data_file
+        # holds the last compacted snapshot
+        self._store = JsonLogStore(data_file, 'carrier')
+        self.log_file = self._store.log_file
         self.carriers = []
-        self._ensure_data_directory()
         self._load_carriers()
-    
-    def _ensure_data_directory(self):
-        """Ensure the data directory exists"""
-        data_dir = os.path.dirname(self.data_file)
-        if data_dir and not os.path.exists(data_dir):
-            os.makedirs(data_dir)
+        # Same dicts as self.carriers, indexed for O(1) lookups
+        self._by_id = {carrier['id']: carrier for carrier in self.carriers}
+        # Etsy-approved subset, kept up to date on every mutation so stats never rescan
+        self._approved = {carrier['id']: carrier for carrier in self.carriers if carrier['etsy_approved']}
     
     def _load_carriers(self):
-        """Load carriers from JSON file"""
+        """Load carriers from the JSON snapshot and replay the mutation log on top"""
         try:
-            if os.path.exists(self.data_file):
-                with open(self.data_file, 'r', encoding='utf-8') as f:
-                    self.carriers = json.load(f)
-                logger.debug(f"Loaded {len(self.carriers)} carriers from {self.data_file}")
+            carriers = self._store.load()
+            if carriers is not None:
+                self.carriers = carriers
+                logger.debug("Loaded %d carriers from %s", len(self.carriers), self.data_file)
             else:
                 # Initialize with some default carriers
                 self.carriers = self._get_default_carriers()
-                self._save_carriers()
-                logger.debug(f"Created default carriers data at {self.data_file}")
+                self._store.compact(self.carriers)
+                logger.debug("Created default carriers data at %s", self.data_file)
         except Exception as e:
             logger.error(f"Error loading carriers: {str(e)}")
             self.carriers = self._get_default_carriers()
@@ -88,28 +90,34 @@ class CarrierService:
             }
         ]
     
-    def _save_carriers(self):
-        """Save carriers to JSON file"""
+    def _append_log(self, entry: Dict, apply: Callable[[], None]):
+        """Record a single mutation, then make it in memory with apply (skipped if the write fails)"""
         try:
-            with open(self.data_file, 'w', encoding='utf-8') as f:
-                json.dump(self.carriers, f, indent=2, ensure_ascii=False)
-            logger.debug(f"Saved {len(self.carriers)} carriers to {self.data_file}")
+            self._store.append(entry, self.carriers, apply)
         except Exception as e:
             logger.error(f"Error saving carriers: {str(e)}")
             raise
     
     def get_all_carriers(self) -> List[Dict]:
-        """Get all carriers"""
-        return self.carriers.copy()
+        """Get all carriers (a new list of the stored carrier dicts; treat them as read-only)"""
+        return list(self.carriers)
     
-    def get_carrier_by_id(self, carrier_id: str) -> Optional[Dict]:
-        """Get a carrier by ID"""
-        for carrier in self.carriers:
-            if carrier['id'] == carrier_id:
-                return carrier.copy()
-        return None
+    def get_carrier_by_id(self, carrier_id: str) -> Optional[Mapping]:
+        """Get a read-only view of a carrier by ID"""
+        carrier = self._by_id.get(carrier_id)
+        return MappingProxyType(carrier) if carrier else None
+    
+    def _insert_carrier(self, carrier: Dict):
+        """Log a newly created carrier, then store it"""
+        def apply():
+            self.carriers.append(carrier)
+            self._by_id[carrier['id']] = carrier
+            if carrier['etsy_approved']:
+                self._approved[carrier['id']] = carrier
+        
+        self._append_log({'op': 'add', 'carrier': carrier}, apply)
     
-    def add_carrier(self, carrier_name: str, etsy_approved: bool, example_tracking: str, alternative_text: str = None) -> Dict:
+    def add_carrier(self, carrier_name: str, etsy_approved: bool, example_tracking: str, alternative_text: str = None) -> Mapping:
         """Add a new carrier"""
         carrier = {
             "id": str(uuid.uuid4()),
@@ -122,44 +130,57 @@ class CarrierService:
         if alternative_text is not None:
             carrier["alternative_text"] = alternative_text.strip()
         
-        self.carriers.append(carrier)
-        self._save_carriers()
+        self._insert_carrier(carrier)
         
-        logger.info(f"Added new carrier: {carrier_name}")
-        return carrier.copy()
+        logger.info("Added new carrier: %s", carrier_name)
+        return MappingProxyType(carrier)
     
     def update_carrier(self, carrier_id: str, carrier_name: str = None, 
-                      etsy_approved: bool = None, example_tracking: str = None, alternative_text: str = None) -> Optional[Dict]:
+                      etsy_approved: bool = None, example_tracking: str = None, alternative_text: str = None) -> Optional[Mapping]:
         """Update an existing carrier"""
-        for i, carrier in enumerate(self.carriers):
-            if carrier['id'] == carrier_id:
-                if carrier_name is not None:
-                    carrier['carrier_name'] = carrier_name.strip()
-                if etsy_approved is not None:
-                    carrier['etsy_approved'] = etsy_approved
-                if example_tracking is not None:
-                    carrier['example_tracking'] = example_tracking.strip()
-                if alternative_text is not None:
-                    carrier['alternative_text'] = alternative_text.strip()
-                
-                self._save_carriers()
-                logger.info(f"Updated carrier: {carrier['carrier_name']}")
-                return carrier.copy()
+        carrier = self._by_id.get(carrier_id)
+        if not carrier:
+            return None
         
-        return None
+        fields = {}
+        if carrier_name is not None:
+            fields['carrier_name'] = carrier_name.strip()
+        if etsy_approved is not None:
+            fields['etsy_approved'] = etsy_approved
+        if example_tracking is not None:
+            fields['example_tracking'] = example_tracking.strip()
+        if alternative_text is not None:
+            fields['alternative_text'] = alternative_text.strip()
+        
+        def apply():
+            carrier.update(fields)
+            if carrier['etsy_approved']:
+                self._approved[carrier_id] = carrier
+            else:
+                self._approved.pop(carrier_id, None)
+        
+        self._append_log({'op': 'update', 'id': carrier_id, 'fields': fields}, apply)
+        logger.info("Updated carrier: %s", carrier['carrier_name'])
+        return MappingProxyType(carrier)
     
     def delete_carrier(self, carrier_id: str) -> bool:
         """Delete a carrier"""
-        for i, carrier in enumerate(self.carriers):
-            if carrier['id'] == carrier_id:
-                deleted_carrier = self.carriers.pop(i)
-                self._save_carriers()
-                logger.info(f"Deleted carrier: {deleted_carrier['carrier_name']}")
-                return True
+        deleted_carrier = self._by_id.get(carrier_id)
+        if not deleted_carrier:
+            return False
+        
+        def apply():
+            # Another request may have deleted it while this one was writing
+            if self._by_id.pop(carrier_id, None) is None:
+                return
+            self.carriers.remove(deleted_carrier)
+            self._approved.pop(carrier_id, None)
         
-        return False
+        self._append_log({'op': 'delete', 'id': carrier_id}, apply)
+        logger.info("Deleted carrier: %s", deleted_carrier['carrier_name'])
+        return True
     
-    def add_alternative_carrier(self, alternative_text: str) -> Dict:
+    def add_alternative_carrier(self, alternative_text: str) -> Mapping:
         """Add an alternative carrier with custom text"""
         carrier = {
             "id": str(uuid.uuid4()),
@@ -170,13 +191,12 @@ class CarrierService:
             "is_alternative": True  # Flag to identify alternative carriers
         }
         
-        self.carriers.append(carrier)
-        self._save_carriers()
+        self._insert_carrier(carrier)
         
-        logger.info(f"Added alternative carrier with text: {alternative_text}")
-        return carrier.copy()
+        logger.info("Added alternative carrier with text: %s", alternative_text)
+        return MappingProxyType(carrier)
     
-    def search_carriers(self, query: str) -> List[Dict]:
+    def search_carriers(self, query: str) -> List[Mapping]:
         """Search carriers by name"""
         query = query.lower().strip()
         if not query:
@@ -185,18 +205,18 @@ class CarrierService:
         results = []
         for carrier in self.carriers:
             if query in carrier['carrier_name'].lower():
-                results.append(carrier.copy())
+                results.append(MappingProxyType(carrier))
         
         return results
     
-    def get_etsy_approved_carriers(self) -> List[Dict]:
+    def get_etsy_approved_carriers(self) -> List[Mapping]:
         """Get only Etsy-approved carriers"""
-        return [carrier.copy() for carrier in self.carriers if carrier['etsy_approved']]
+        return [MappingProxyType(carrier) for carrier in self._approved.values()]
     
     def get_carrier_stats(self) -> Dict:
         """Get carrier statistics"""
         total = len(self.carriers)
-        etsy_approved = len([c for c in self.carriers if c['etsy_approved']])
+        etsy_approved = len(self._approved)
         not_approved = total - etsy_approved
         
         return {
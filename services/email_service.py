@@ -1,18 +1,47 @@
 import imaplib
 import email
 from email.header import decode_header
-from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone, timedelta
 import os
+import time
+import atexit
+import re
+import json
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Optional
 from config import (
     EMAIL_IMAP_SERVER,
     EMAIL_USERNAME,
     EMAIL_PASSWORD,
     ALLOWED_SENDERS,
-    LAST_SCRAPE_FILE
+    LAST_SCRAPE_FILE,
+    EMAIL_UID_CACHE_FILE
 )
 import pytz
 
+# UID of a message in a FETCH response line, e.g. b'12 (UID 345 BODY[HEADER.FIELDS (...)] {210}'
+FETCH_UID_PATTERN = re.compile(rb'\bUID (\d+)')
+# Messages per UID FETCH command, keeping the command line within server limits
+FETCH_BATCH_SIZE = 500
+# Full messages are much larger than their headers, so fetch them in smaller batches
+# that can be spread over several connections
+MESSAGE_BATCH_SIZE = 50
+# Most IMAP connections used at once for a multi-batch fetch (Gmail allows 15 per account)
+FETCH_CONNECTIONS = 4
+# Just the headers needed to filter messages; PEEK leaves them unread
+HEADERS_QUERY = '(BODY.PEEK[HEADER.FIELDS (FROM TO SUBJECT DATE)])'
+MESSAGE_QUERY = '(BODY.PEEK[])'
+# The last scrape time lives in memory; write it out at most this often (and at exit)
+LAST_SCRAPE_FLUSH_SECONDS = 60
+
+@lru_cache(maxsize=4096)
+def parse_email_date(value: str) -> datetime:
+    """Parse a Date header. Cached because scrape_new_emails parses each message's date twice
+    (headers, then the full message) and rescans parse the same messages again"""
+    return parsedate_to_datetime(value)
+
 class EmailService:
     def __init__(self):
         self.imap_server = EMAIL_IMAP_SERVER
@@ -20,12 +49,25 @@ class EmailService:
         self.password = EMAIL_PASSWORD.encode('utf-8').decode('utf-8')  # Ensure password is UTF-8
         self.allowed_senders = ALLOWED_SENDERS
         self.last_scrape_file = LAST_SCRAPE_FILE
+        self.uid_cache_file = EMAIL_UID_CACHE_FILE
         
         # Ensure the directory for the last_scrape_file exists
         os.makedirs(os.path.dirname(self.last_scrape_file), exist_ok=True)
+        
+        # Read from the file on first use, then kept here; see flush_last_scrape_time
+        self._last_scrape = None
+        self._last_scrape_dirty = False
+        self._last_scrape_flushed = time.monotonic()
+        atexit.register(self.flush_last_scrape_time)
     
     def get_last_scrape_time(self) -> datetime:
         """Get the timestamp of the last email scrape"""
+        if self._last_scrape is None:
+            self._last_scrape = self._read_last_scrape_time()
+        return self._last_scrape
+    
+    def _read_last_scrape_time(self) -> datetime:
+        """Read the last scrape timestamp from disk"""
         try:
             if os.path.exists(self.last_scrape_file):
                 with open(self.last_scrape_file, 'r') as f:
@@ -47,24 +89,63 @@ class EmailService:
         Update the timestamp of the last email scrape
         If no timestamp is provided, uses current time
         """
+        if timestamp is None:
+            timestamp = datetime.now(timezone.utc)
+        elif timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=timezone.utc)
+        self._last_scrape = timestamp
+        self._last_scrape_dirty = True
+        
+        if time.monotonic() - self._last_scrape_flushed >= LAST_SCRAPE_FLUSH_SECONDS:
+            self.flush_last_scrape_time()
+    
+    def flush_last_scrape_time(self):
+        """Write the last scrape timestamp to disk if it changed since the last write"""
+        if not self._last_scrape_dirty:
+            return
         try:
-            # Ensure the directory exists
-            os.makedirs(os.path.dirname(self.last_scrape_file), exist_ok=True)
-            
-            # Write the timestamp
             with open(self.last_scrape_file, 'w') as f:
-                if timestamp is None:
-                    timestamp = datetime.now(timezone.utc)
-                elif timestamp.tzinfo is None:
-                    timestamp = timestamp.replace(tzinfo=timezone.utc)
-                f.write(timestamp.isoformat())
+                f.write(self._last_scrape.isoformat())
+            self._last_scrape_dirty = False
+            self._last_scrape_flushed = time.monotonic()
         except Exception as e:
             print(f"Warning: Failed to update last scrape time: {str(e)}")
     
+    def _get_uidvalidity(self, mail) -> Optional[str]:
+        """UIDVALIDITY of the selected mailbox; UIDs are only stable while it stays the same"""
+        _, data = mail.response('UIDVALIDITY')
+        if data and data[0]:
+            return data[0].decode() if isinstance(data[0], bytes) else str(data[0])
+        return None
+    
+    def load_processed_uids(self, uidvalidity: str) -> set:
+        """Get the UIDs already processed for this mailbox (empty if the mailbox was reset)"""
+        try:
+            if os.path.exists(self.uid_cache_file):
+                with open(self.uid_cache_file, 'r') as f:
+                    cache = json.load(f)
+                if cache.get('uidvalidity') == uidvalidity:
+                    return set(cache.get('uids', []))
+        except Exception as e:
+            print(f"Warning: Error reading email UID cache: {str(e)}")
+        return set()
+    
+    def save_processed_uids(self, uidvalidity: str, uids: set):
+        """Remember which UIDs have been processed"""
+        try:
+            os.makedirs(os.path.dirname(self.uid_cache_file), exist_ok=True)
+            with open(self.uid_cache_file, 'w') as f:
+                json.dump({'uidvalidity': uidvalidity, 'uids': sorted(uids)}, f)
+        except Exception as e:
+            print(f"Warning: Failed to update email UID cache: {str(e)}")
+    
     def decode_email_subject(self, subject) -> str:
         """Decode email subject"""
         if subject is None:
             return ""
+        # Without RFC 2047 encoded words decode_header would hand the subject back unchanged
+        if isinstance(subject, str) and '=?' not in subject:
+            return subject
         
         decoded_headers = decode_header(subject)
         subject_parts = []
@@ -84,20 +165,21 @@ class EmailService:
         return " ".join(subject_parts)
     
     def get_email_body(self, msg) -> str:
-        """Extract email body text"""
+        """Extract email body text (the first text/plain part), decoding it only once"""
         if msg.is_multipart():
-            for part in msg.walk():
-                if part.get_content_type() == "text/plain":
-                    try:
-                        return part.get_payload(decode=True).decode()
-                    except:
-                        return part.get_payload(decode=True).decode('utf-8', 'ignore')
+            part = next((part for part in msg.walk() if part.get_content_type() == "text/plain"), None)
+            if part is None:
+                return ""
         else:
-            try:
-                return msg.get_payload(decode=True).decode()
-            except:
-                return msg.get_payload(decode=True).decode('utf-8', 'ignore')
-        return ""
+            part = msg
+        
+        raw = part.get_payload(decode=True)
+        if not raw:
+            return ""
+        try:
+            return raw.decode(part.get_content_charset() or 'utf-8', errors='replace')
+        except LookupError:  # Unknown charset name
+            return raw.decode('utf-8', errors='replace')
     
     def compare_dates(self, dt1: datetime, dt2: datetime) -> bool:
         """
@@ -110,61 +192,140 @@ class EmailService:
             dt2 = dt2.replace(tzinfo=timezone.utc)
         return dt1 > dt2
     
-    def scrape_new_emails(self, max_emails: int = None) -> List[Dict]:
+    def _from_any_criteria(self) -> str:
+        """IMAP search key matching mail from any allowed sender (OR is binary, so chain it in prefix form)"""
+        return 'OR ' * (len(self.allowed_senders) - 1) + ' '.join(
+            f'FROM "{sender}"' for sender in self.allowed_senders)
+    
+    def _connect(self, readonly: bool = False):
+        """Open an IMAP connection with the inbox selected"""
+        mail = imaplib.IMAP4_SSL(self.imap_server)
+        mail.login(self.username, self.password)
+        mail.select('inbox', readonly=readonly)
+        return mail
+    
+    def _uid_fetch(self, mail, uids: List[bytes], query: str, batch_size: int = FETCH_BATCH_SIZE) -> Dict[bytes, bytes]:
+        """
+        Fetch the same item for many messages in batched UID FETCH commands. When there is
+        more than one batch, the batches are shared out over extra connections so their
+        round trips overlap; mail keeps the first share.
+        :return: Dictionary of UID to fetched bytes
+        """
+        batches = [uids[start:start + batch_size] for start in range(0, len(uids), batch_size)]
+        connections = min(FETCH_CONNECTIONS, len(batches))
+        if connections <= 1:
+            return self._fetch_batches(mail, batches, query)
+        
+        shares = [batches[i::connections] for i in range(connections)]
+        with ThreadPoolExecutor(max_workers=connections - 1, thread_name_prefix='imap-fetch') as executor:
+            # imaplib connections are not thread-safe, so each extra share gets its own
+            futures = [executor.submit(self._fetch_batches_on_new_connection, share, query) for share in shares[1:]]
+            results = self._fetch_batches(mail, shares[0], query)
+            for future in futures:
+                results.update(future.result())
+        return results
+    
+    def _fetch_batches_on_new_connection(self, batches: List[List[bytes]], query: str) -> Dict[bytes, bytes]:
+        """Run _fetch_batches on a separate read-only connection"""
+        mail = self._connect(readonly=True)
+        try:
+            return self._fetch_batches(mail, batches, query)
+        finally:
+            mail.logout()
+    
+    def _fetch_batches(self, mail, batches: List[List[bytes]], query: str) -> Dict[bytes, bytes]:
+        """Issue one UID FETCH per batch on a single connection"""
+        results = {}
+        for batch in batches:
+            _, data = mail.uid('FETCH', b','.join(batch), query)
+            pending = None
+            for item in data:
+                if isinstance(item, tuple):
+                    match = FETCH_UID_PATTERN.search(item[0])
+                    if match:
+                        results[match.group(1)] = item[1]
+                    else:
+                        pending = item[1]
+                elif pending is not None and isinstance(item, bytes):
+                    # Some servers send the UID after the literal, e.g. b' UID 345)'
+                    match = FETCH_UID_PATTERN.search(item)
+                    if match:
+                        results[match.group(1)] = pending
+                    pending = None
+        return results
+    
+    def scrape_new_emails(self, max_emails: int = None, use_cache: bool = True) -> List[Dict]:
         """
         Scrape new emails from allowed senders
         :param max_emails: Maximum number of emails to retrieve (None for all new emails)
+        :param use_cache: Skip messages processed by an earlier scrape (False forces a rescan)
         :return: List of email data dictionaries
         """
+        if not self.allowed_senders:
+            return []
+        
         try:
             # Connect to IMAP server
-            mail = imaplib.IMAP4_SSL(self.imap_server)
-            mail.login(self.username, self.password)
-            mail.select('inbox')
+            mail = self._connect()
+            uidvalidity = self._get_uidvalidity(mail)
             
-            # Search for emails from allowed senders
-            search_criteria = []
-            for sender in self.allowed_senders:
-                _, messages = mail.search(None, f'FROM "{sender}"')
-                if messages[0]:
-                    search_criteria.extend(messages[0].split())
+            # IMAP SINCE compares dates in the server's timezone, so search from yesterday
+            # and apply the exact "received today" check on the headers below
+            since = (datetime.now() - timedelta(days=1)).strftime('%d-%b-%Y')
             
-            email_list = []
-            # Sort message IDs in reverse order (newest first)
-            search_criteria.sort(reverse=True)
+            # Search for emails from allowed senders (a single search with OR'd FROM keys)
+            _, messages = mail.uid('SEARCH', None, 'SINCE', since, self._from_any_criteria())
+            
+            # Sort UIDs in reverse order (newest first), dropping any the server repeats
+            uids = sorted(set(messages[0].split()), key=int, reverse=True)
+            
+            # Skip messages an earlier scrape already handled. Only UIDs still matching the
+            # search are kept in the cache, so it stays as small as the search window.
+            found_uids = {int(uid) for uid in uids}
+            processed_uids = self.load_processed_uids(uidvalidity) & found_uids if uidvalidity else set()
+            if use_cache:
+                uids = [uid for uid in uids if int(uid) not in processed_uids]
             
             # Limit the number of emails if specified
             if max_emails:
-                search_criteria = search_criteria[:max_emails]
+                uids = uids[:max_emails]
+            
+            # Fetch only the headers of every candidate in one go
+            headers = self._uid_fetch(mail, uids, HEADERS_QUERY)
             
-            for num in search_criteria:
+            # Only include emails received today (local time)
+            local_tz = datetime.now().astimezone().tzinfo
+            today = datetime.now(local_tz).date()
+            todays_uids = []
+            for uid in uids:
                 try:
-                    _, msg_data = mail.fetch(num, '(RFC822)')
-                    email_body = msg_data[0][1]
-                    email_message = email.message_from_bytes(email_body)
+                    date = parse_email_date(email.message_from_bytes(headers[uid])['date'])
+                    email_date_local = date.astimezone(local_tz).date() if date.tzinfo else date.date()
+                    if email_date_local == today:
+                        todays_uids.append(uid)
+                    elif email_date_local < today:
+                        # Older mail can never become today's
+                        processed_uids.add(int(uid))
+                except Exception as e:
+                    print(f"Warning: Failed to process email: {str(e)}")
+                    continue
+            
+            # Download full messages for the emails we keep
+            messages = self._uid_fetch(mail, todays_uids, MESSAGE_QUERY, MESSAGE_BATCH_SIZE)
+            
+            email_list = []
+            for uid in todays_uids:
+                try:
+                    email_message = email.message_from_bytes(messages[uid])
                     
                     # Extract email data
                     subject = self.decode_email_subject(email_message['subject'])
                     sender = email_message['from']
                     recipient = email_message['to']
-                    date = email.utils.parsedate_to_datetime(email_message['date'])
-                    
-                    # Only include emails received today (local time)
-                    local_tz = datetime.now().astimezone().tzinfo
-                    today = datetime.now(local_tz).date()
-                    email_date_local = date.astimezone(local_tz).date() if date.tzinfo else date.date()
-                    if email_date_local != today:
-                        continue
+                    date = parse_email_date(email_message['date'])
                     
                     # Get email body
-                    body = ""
-                    if email_message.is_multipart():
-                        for part in email_message.walk():
-                            if part.get_content_type() == "text/plain":
-                                body = part.get_payload(decode=True).decode()
-                                break
-                    else:
-                        body = email_message.get_payload(decode=True).decode()
+                    body = self.get_email_body(email_message)
                     
                     email_data = {
                         'subject': subject,
@@ -175,6 +336,7 @@ class EmailService:
                     }
                     
                     email_list.append(email_data)
+                    processed_uids.add(int(uid))
                     
                 except Exception as e:
                     print(f"Warning: Failed to process email: {str(e)}")
@@ -184,6 +346,10 @@ class EmailService:
             if email_list:  # Only update if we found new emails
                 self.update_last_scrape_time()
             
+            # Messages that failed to process stay out of the cache and are retried next time
+            if uidvalidity:
+                self.save_processed_uids(uidvalidity, processed_uids)
+            
             mail.close()
             mail.logout()
             
@@ -191,4 +357,4 @@ class EmailService:
             
         except Exception as e:
             print(f"Warning: Failed to scrape emails: {str(e)}")
-            return [] 
\ No newline at end of file
+            return []
\ No newline at end of file
@@ -1,10 +1,33 @@
 import pandas as pd
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Union, BinaryIO
 import os
+import zipfile
 import numpy as np
 import logging
 
-logging.basicConfig(level=logging.DEBUG)
+# Prefer the Rust-based calamine reader; fall back to pandas' default engine
+try:
+    import python_calamine  # noqa: F401
+    EXCEL_ENGINE = 'calamine'
+except ImportError:
+    EXCEL_ENGINE = None
+
+# Clean the order/tracking columns with Arrow string kernels when pyarrow is installed
+try:
+    import pyarrow  # noqa: F401
+    STRING_DTYPE = 'string[pyarrow]'
+except ImportError:
+    STRING_DTYPE = object
+
+# Without calamine, .xlsx files are streamed with openpyxl directly
+try:
+    import openpyxl
+    from openpyxl.utils.exceptions import InvalidFileException
+    OPENPYXL_AVAILABLE = True
+except ImportError:
+    OPENPYXL_AVAILABLE = False
+    openpyxl = None
+
 logger = logging.getLogger(__name__)
 
 class ExcelService:
@@ -13,134 +36,181 @@ class ExcelService:
             'order-number': ['order-number', 'order #', 'ORDER #', 'order_number'],
             'tracking': ['tracking', 'tracking number', 'TRACKING NUMBER', 'Tracking']
         }
+        # Precomputed per target: the names as written, for exact matches, and each lowercase
+        # name with its priority (earlier mapping entries win) for case-insensitive ones
+        self._exact_names = {target: frozenset(names) for target, names in self.column_mappings.items()}
+        self._lowercase_ranks = {}
+        for target, names in self.column_mappings.items():
+            ranks = self._lowercase_ranks[target] = {}
+            for rank, name in enumerate(names):
+                ranks.setdefault(name.lower(), rank)
+        # Every header any mapping could match, so other columns can be skipped while reading
+        self._known_columns = frozenset().union(*self._lowercase_ranks.values())
     
     def find_matching_column(self, columns: List[str], target_type: str) -> str:
         """
         Find the first matching column name from the possible mappings
         Returns the found column name or None
         """
-        logger.debug(f"Looking for {target_type} in columns: {columns}")
-        # Convert all columns to lowercase for case-insensitive comparison
-        columns_lower = [col.lower() for col in columns]
-        possible_names = self.column_mappings[target_type]
+        logger.debug("Looking for %s in columns: %s", target_type, columns)
+        exact_names = self._exact_names[target_type]
+        lowercase_ranks = self._lowercase_ranks[target_type]
         
-        # First try exact match with original case
+        # An exact match with the original case wins outright; otherwise keep the
+        # case-insensitive match whose name comes first in the mapping
+        best_rank = None
+        matched_col = None
         for col in columns:
-            if col in possible_names:
-                logger.debug(f"Found exact match for {target_type}: {col}")
+            if col in exact_names:
+                logger.debug("Found exact match for %s: %s", target_type, col)
                 return col
+            rank = lowercase_ranks.get(col.lower())
+            if rank is not None and (best_rank is None or rank < best_rank):
+                best_rank, matched_col = rank, col
         
-        # Then try lowercase match
-        for possible_name in possible_names:
-            if possible_name.lower() in columns_lower:
-                # Return the original column name that matched
-                matched_col = columns[columns_lower.index(possible_name.lower())]
-                logger.debug(f"Found case-insensitive match for {target_type}: {matched_col}")
-                return matched_col
+        if matched_col is not None:
+            logger.debug("Found case-insensitive match for %s: %s", target_type, matched_col)
+            return matched_col
         
-        logger.warning(f"No match found for {target_type}. Tried: {possible_names}")
+        logger.warning(f"No match found for {target_type}. Tried: {self.column_mappings[target_type]}")
         return None
     
-    def validate_excel_file(self, file_path: str) -> Tuple[bool, str, Dict[str, str]]:
+    def _read_excel(self, source: Union[str, BinaryIO]) -> pd.DataFrame:
+        """Read a workbook from a path or a binary file object, rewinding file objects first"""
+        if hasattr(source, 'seek'):
+            source.seek(0)
+        if EXCEL_ENGINE is None and OPENPYXL_AVAILABLE:
+            try:
+                return self._stream_xlsx(source)
+            except (InvalidFileException, zipfile.BadZipFile):
+                # Not an .xlsx workbook (e.g. legacy .xls); let pandas pick a reader
+                if hasattr(source, 'seek'):
+                    source.seek(0)
+        # Read everything as text so order numbers are never coerced to floats, and only
+        # build columns that could be the order or tracking column
+        return pd.read_excel(source, engine=EXCEL_ENGINE, dtype=str,
+                             usecols=lambda column: str(column).lower() in self._known_columns)
+    
+    def _stream_xlsx(self, source: Union[str, BinaryIO]) -> pd.DataFrame:
         """
-        Validates that the Excel file has the required columns.
-        Returns (is_valid, error_message, column_mapping)
+        Read the first sheet row by row with openpyxl in read-only mode, keeping only the
+        columns that could be the order or tracking column. Produces the same frame as
+        _read_excel's pandas path: text values, NaN for blank cells, trailing blank rows dropped.
         """
+        workbook = openpyxl.load_workbook(source, read_only=True, data_only=True)
         try:
-            logger.debug(f"Reading Excel file: {file_path}")
-            df = pd.read_excel(file_path)
-            logger.debug(f"Found columns: {list(df.columns)}")
-            column_mapping = {}
+            rows = workbook.worksheets[0].iter_rows(values_only=True)
+            header = next(rows, ())
             
-            # Find matching columns for each required field
-            order_column = self.find_matching_column(df.columns, 'order-number')
-            tracking_column = self.find_matching_column(df.columns, 'tracking')
-            
-            missing_columns = []
-            if not order_column:
-                missing_columns.append("Order Number (tried: " + ", ".join(self.column_mappings['order-number']) + ")")
-            else:
-                column_mapping['order-number'] = order_column
-                
-            if not tracking_column:
-                missing_columns.append("Tracking Number (tried: " + ", ".join(self.column_mappings['tracking']) + ")")
-            else:
-                column_mapping['tracking'] = tracking_column
+            kept = []  # (column index, column name), names made unique like pandas does
+            seen = {}
+            for index, name in enumerate(header):
+                if name is None or str(name).lower() not in self._known_columns:
+                    continue
+                name = str(name)
+                count = seen.get(name, 0)
+                seen[name] = count + 1
+                kept.append((index, f"{name}.{count}" if count else name))
             
-            if missing_columns:
-                error_msg = f"Missing required columns: {', '.join(missing_columns)}"
-                logger.error(error_msg)
-                return False, error_msg, {}
+            columns = [[] for _ in kept]
+            row_count = data_rows = 0
+            for row in rows:
+                for values, (index, _) in zip(columns, kept):
+                    value = row[index] if index < len(row) else None
+                    if isinstance(value, float) and value.is_integer():
+                        value = int(value)  # Order numbers stored as numbers
+                    values.append(np.nan if value is None else str(value))
+                row_count += 1
+                if any(value is not None for value in row):
+                    data_rows = row_count
+        finally:
+            workbook.close()
+        
+        return pd.DataFrame({name: values[:data_rows] for values, (_, name) in zip(columns, kept)},
+                            columns=[name for _, name in kept], dtype=object)
+    
+    def _validate_columns(self, columns: List[str]) -> Tuple[bool, str, Dict[str, str]]:
+        """
+        Checks that the required columns are present.
+        Returns (is_valid, error_message, column_mapping)
+        """
+        logger.debug("Found columns: %s", list(columns))
+        column_mapping = {}
+        
+        # Find matching columns for each required field
+        order_column = self.find_matching_column(columns, 'order-number')
+        tracking_column = self.find_matching_column(columns, 'tracking')
+        
+        missing_columns = []
+        if not order_column:
+            missing_columns.append("Order Number (tried: " + ", ".join(self.column_mappings['order-number']) + ")")
+        else:
+            column_mapping['order-number'] = order_column
             
-            logger.debug(f"Validation successful. Column mapping: {column_mapping}")
-            return True, "", column_mapping
-        except Exception as e:
-            error_msg = f"Error reading Excel file: {str(e)}"
-            logger.error(error_msg, exc_info=True)
+        if not tracking_column:
+            missing_columns.append("Tracking Number (tried: " + ", ".join(self.column_mappings['tracking']) + ")")
+        else:
+            column_mapping['tracking'] = tracking_column
+        
+        if missing_columns:
+            error_msg = f"Missing required columns: {', '.join(missing_columns)}"
+            logger.error(error_msg)
             return False, error_msg, {}
+        
+        logger.debug("Validation successful. Column mapping: %s", column_mapping)
+        return True, "", column_mapping
     
-    def clean_value(self, value) -> str:
+    def validate_excel_file(self, file_path: Union[str, BinaryIO]) -> Tuple[bool, str, Dict[str, str]]:
         """
-        Cleans a value by handling NaN, None, and other special cases
+        Validates that the Excel file has the required columns.
+        Returns (is_valid, error_message, column_mapping)
         """
-        if pd.isna(value) or value is None:
-            return ""
-        return str(value).strip()
+        try:
+            logger.debug("Reading Excel file: %s", file_path)
+            return self._validate_columns(self._read_excel(file_path).columns)
+        except Exception as e:
+            error_msg = f"Error reading Excel file: {str(e)}"
+            logger.error(error_msg, exc_info=True)
+            return False, error_msg, {}
     
-    def process_excel_file(self, file_path: str) -> Tuple[List[Dict], str]:
+    def process_excel_file(self, file_path: Union[str, BinaryIO]) -> Tuple[List[Dict], str]:
         """
-        Processes the Excel file and returns a list of order data and any error message.
+        Processes the Excel file (a path or an uploaded file object) and returns a list of order data and any error message.
         Returns (order_data, error_message)
         """
         try:
-            # Validate file first
-            is_valid, error_message, column_mapping = self.validate_excel_file(file_path)
+            # Read the workbook once and validate its columns
+            df = self._read_excel(file_path)
+            logger.debug("Read Excel file with %d rows", len(df))
+            is_valid, error_message, column_mapping = self._validate_columns(df.columns)
             if not is_valid:
                 return [], error_message
             
-            # Read Excel file
-            df = pd.read_excel(file_path)
-            logger.debug(f"Read Excel file with {len(df)} rows")
+            # Extract required columns and clean the data. Cells were read as text, so after
+            # blanks become "" every value is a str.
+            order_numbers = df[column_mapping['order-number']].astype(STRING_DTYPE).fillna('').str.strip()
+            tracking_numbers = df[column_mapping['tracking']].astype(STRING_DTYPE).fillna('').str.strip()
             
-            # Extract required columns and clean the data
-            order_data_dict = {}  # Use dict to handle duplicates - last occurrence wins
-            skipped_count = 0
-            empty_tracking_count = 0
-            empty_order_count = 0
-            duplicate_count = 0
+            has_order = order_numbers != ''
+            has_tracking = tracking_numbers != ''
+            empty_order_count = int((~has_order).sum())
+            empty_tracking_count = int((has_order & ~has_tracking).sum())
             
-            for _, row in df.iterrows():
-                order_number = self.clean_value(row[column_mapping['order-number']])
-                tracking_number = self.clean_value(row[column_mapping['tracking']])
-                
-                if not order_number:
-                    empty_order_count += 1
-                    continue
-                
-                if not tracking_number:
-                    empty_tracking_count += 1
-                    continue
-                
-                # Clean order number (remove # if present)
-                clean_order = str(order_number).strip()
-                if clean_order.startswith('#'):
-                    clean_order = clean_order[1:]
-                
-                # Check if this order number already exists in our current batch
-                if clean_order in order_data_dict:
-                    duplicate_count += 1
-                    logger.debug(f"Found duplicate order number '{clean_order}', keeping latest occurrence")
-                
-                # Store order info (this will override if duplicate exists)
-                order_info = {
-                    'order_number': clean_order,
-                    'tracking_number': str(tracking_number)
-                }
-                order_data_dict[clean_order] = order_info
-                logger.debug(f"Added/Updated order: {order_info}")
+            # Clean order numbers (remove # if present)
+            valid = has_order & has_tracking
+            orders = pd.Series(tracking_numbers[valid].values,
+                               index=order_numbers[valid].str.removeprefix('#').values)
+            
+            # Duplicates within the file: the last occurrence wins, in first-seen order
+            latest = orders.groupby(level=0, sort=False).last()
+            duplicate_count = len(orders) - len(latest)
+            if duplicate_count:
+                logger.debug("Found %s duplicate order number(s), keeping latest occurrences", duplicate_count)
             
-            # Convert dict back to list
-            order_data = list(order_data_dict.values())
+            order_data = [
+                {'order_number': order_number, 'tracking_number': tracking_number}
+                for order_number, tracking_number in zip(latest.index, latest.values)
+            ]
             
             skipped_count = empty_tracking_count + empty_order_count
             
@@ -157,7 +227,7 @@ class ExcelService:
             if messages:
                 message += ": " + ", ".join(messages)
             
-            logger.debug(f"Processed {len(df)} rows, created {len(order_data)} unique entries. {message}")
+            logger.debug("Processed %d rows, created %d unique entries. %s", len(df), len(order_data), message)
             return order_data, message
             
         except Exception as e:
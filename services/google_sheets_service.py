@@ -2,14 +2,17 @@ import logging
 from google.oauth2.credentials import Credentials
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
-from typing import List, Dict, Tuple, Optional
+from typing import List, Dict, Set, Tuple, Optional, Collection
 import os
-from datetime import datetime
+from datetime import date
 import pandas as pd
 
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+# Column E's "Completed" checkbox
+CHECKBOX_VALIDATION = {'condition': {'type': 'BOOLEAN'}, 'showCustomUi': True}
+TRACKING_LINK_PREFIX = "https://parcelsapp.com/en/tracking/"
+
 class GoogleSheetsService:
     def __init__(self):
         self.SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
@@ -17,6 +20,9 @@ class GoogleSheetsService:
         self.spreadsheet_id = None
         self.service = None
         self.tracking_sheet_name = 'Sheet1'  # Use the default sheet name
+        self._sheet_id = None  # Cached by _get_sheet_id / _get_order_row_lookup
+        self._today = None
+        self._today_str = ''
         
         # Define column structure to match the sheet
         self.columns = {
@@ -32,7 +38,7 @@ class GoogleSheetsService:
         Initialize the service with a service account credentials file
         """
         try:
-            logger.debug(f"Initializing Google Sheets service with credentials from {credentials_path}")
+            logger.debug("Initializing Google Sheets service with credentials from %s", credentials_path)
             self.credentials = service_account.Credentials.from_service_account_file(
                 credentials_path, scopes=self.SCOPES)
             self.spreadsheet_id = spreadsheet_id
@@ -109,16 +115,107 @@ class GoogleSheetsService:
             logger.error(f"Failed to get existing data: {str(e)}", exc_info=True)
             return pd.DataFrame(columns=['order_number', 'tracking_number', 'date', 'tracking_link', 'completed'])
     
+    def _get_existing_order_set(self) -> Set[str]:
+        """Get the order numbers already in the sheet, reading only column A below the header"""
+        try:
+            result = self.service.spreadsheets().values().get(
+                spreadsheetId=self.spreadsheet_id,
+                range=f"{self.tracking_sheet_name}!A2:A"
+            ).execute()
+            return {row[0] for row in result.get('values', []) if row}
+        except Exception as e:
+            logger.error(f"Failed to get existing order numbers: {str(e)}", exc_info=True)
+            return set()
+    
+    def _get_order_row_lookup(self) -> Tuple[Dict[str, int], Optional[int]]:
+        """
+        Read only the order number column, together with the tracking sheet's ID, in a
+        single request and map each cleaned order number to its sheet row.
+        Returns (lookup, sheet_id)
+        """
+        try:
+            spreadsheet = self.service.spreadsheets().get(
+                spreadsheetId=self.spreadsheet_id,
+                ranges=[f"{self.tracking_sheet_name}!A:A"],
+                includeGridData=True,
+                fields='sheets(properties(sheetId,title),data(rowData(values(formattedValue))))'
+            ).execute()
+            
+            sheet = next((sheet for sheet in spreadsheet.get('sheets', [])
+                          if sheet['properties']['title'] == self.tracking_sheet_name), None)
+            if sheet is None:
+                return {}, None
+            
+            row_data = sheet.get('data', [{}])[0].get('rowData', [])
+            lookup = {}
+            # Row 1 is the header, so data starts at sheet row 2
+            for row_number, row in enumerate(row_data[1:], start=2):
+                cells = row.get('values')
+                if not cells or 'formattedValue' not in cells[0]:
+                    continue
+                clean_order = str(cells[0]['formattedValue']).strip().replace('#', '')
+                # Keep the first occurrence, matching the sheet's top-down order
+                lookup.setdefault(clean_order, row_number)
+            self._sheet_id = sheet['properties']['sheetId']
+            return lookup, self._sheet_id
+        except Exception as e:
+            logger.error(f"Failed to get existing order numbers: {str(e)}", exc_info=True)
+            return {}, None
+    
+    def _append_rows(self, rows: List[list], sheet_id: int = None) -> Dict:
+        """
+        Append rows after the last row with data, with the checkbox validation set on the
+        new column E cells, in a single batchUpdate
+        """
+        if sheet_id is None:
+            sheet_id = self._get_sheet_id()
+        if sheet_id is None:
+            raise Exception(f"Sheet '{self.tracking_sheet_name}' not found")
+        
+        row_data = []
+        for row in rows:
+            # Strings are stored as entered, like valueInputOption RAW
+            cells = [{'userEnteredValue': {'stringValue': value}} for value in row[:-1]]
+            cells.append({'userEnteredValue': {'boolValue': row[-1]}, 'dataValidation': CHECKBOX_VALIDATION})
+            row_data.append({'values': cells})
+        
+        body = {
+            'requests': [{
+                'appendCells': {
+                    'sheetId': sheet_id,
+                    'rows': row_data,
+                    'fields': 'userEnteredValue,dataValidation'
+                }
+            }]
+        }
+        try:
+            return self.service.spreadsheets().batchUpdate(
+                spreadsheetId=self.spreadsheet_id,
+                body=body
+            ).execute()
+        except Exception:
+            # The sheet may have been deleted and recreated; look its ID up again next time
+            self._sheet_id = None
+            raise
+    
+    def _get_today_str(self) -> str:
+        """Today's date as written to the Date Added column, formatted once per day"""
+        today = date.today()
+        if today != self._today:
+            self._today, self._today_str = today, today.strftime('%d-%m-%Y')
+        return self._today_str
+    
     def _generate_tracking_link(self, tracking_number: str) -> str:
-        """Generate a ParcelApp tracking link for a tracking number"""
+        """Generate a ParcelApp tracking link for a tracking number (the row loops inline this)"""
         if not tracking_number:
             return ""
-        return f"https://parcelsapp.com/en/tracking/{tracking_number}"
+        return TRACKING_LINK_PREFIX + tracking_number
     
-    def _setup_checkbox_validation(self, start_row: int = None, end_row: int = None):
+    def _setup_checkbox_validation(self, start_row: int = None, end_row: int = None, sheet_id: int = None):
         """Setup checkbox data validation for column E for specific rows"""
         try:
-            sheet_id = self._get_sheet_id()
+            if sheet_id is None:
+                sheet_id = self._get_sheet_id()
             if sheet_id is None:
                 logger.warning("Could not get sheet ID for checkbox validation")
                 return
@@ -144,12 +241,7 @@ class GoogleSheetsService:
                             'startColumnIndex': 4,  # Column E (0-indexed)
                             'endColumnIndex': 5  # End at column E
                         },
-                        'rule': {
-                            'condition': {
-                                'type': 'BOOLEAN'
-                            },
-                            'showCustomUi': True
-                        }
+                        'rule': CHECKBOX_VALIDATION
                     }
                 }]
             }
@@ -159,9 +251,11 @@ class GoogleSheetsService:
                 body=body
             ).execute()
             
-            logger.debug(f"Successfully set up checkbox validation for column E, rows {start_row} to {end_row}")
+            logger.debug("Successfully set up checkbox validation for column E, rows %s to %s", start_row, end_row)
             
         except Exception as e:
+            # The sheet may have been deleted and recreated; look its ID up again next time
+            self._sheet_id = None
             logger.warning(f"Failed to setup checkbox validation: {str(e)}")
 
     def append_order_data(self, order_data: List[Dict]) -> bool:
@@ -170,16 +264,16 @@ class GoogleSheetsService:
             if not order_data:
                 return True
             
-            logger.debug(f"Processing {len(order_data)} orders")
-            # Get existing data
-            existing_df = self._get_existing_data()
+            logger.debug("Processing %d orders", len(order_data))
+            # Get existing order numbers
+            existing_orders = self._get_existing_order_set()
             
             # Prepare new data
             new_rows = []
-            today = datetime.now().strftime('%d-%m-%Y')
+            today = self._get_today_str()
             
             for order in order_data:
-                logger.debug(f"Processing order: {order}")
+                logger.debug("Processing order: %s", order)
                 # Make sure we're accessing the correct dictionary keys
                 order_number = str(order.get('order_number', ''))  # Convert to string to ensure consistency
                 tracking_number = str(order.get('tracking_number', ''))
@@ -188,7 +282,7 @@ class GoogleSheetsService:
                     logger.warning("Skipping order with no order number")
                     continue
                     
-                tracking_link = self._generate_tracking_link(tracking_number)
+                tracking_link = TRACKING_LINK_PREFIX + tracking_number if tracking_number else ""
                 new_row = [
                     order_number,
                     tracking_number,
@@ -196,50 +290,27 @@ class GoogleSheetsService:
                     tracking_link,
                     False  # Checkbox starts unchecked
                 ]
-                logger.debug(f"Created row: {new_row}")
+                logger.debug("Created row: %s", new_row)
                 new_rows.append(new_row)
             
             if not new_rows:  # If no valid rows to add
                 logger.debug("No valid rows to append")
                 return True
                 
-            new_df = pd.DataFrame(new_rows, columns=['order_number', 'tracking_number', 'date', 'tracking_link', 'completed'])
-            logger.debug(f"Created DataFrame with {len(new_df)} rows")
-            
             # Remove duplicates based on order number
-            if not existing_df.empty:
-                logger.debug(f"Checking for duplicates against {len(existing_df)} existing rows")
-                new_df = new_df[~new_df['order_number'].isin(existing_df['order_number'])]
-                logger.debug(f"After duplicate removal: {len(new_df)} rows")
+            if existing_orders:
+                logger.debug("Checking for duplicates against %d existing orders", len(existing_orders))
+                new_rows = [row for row in new_rows if row[0] not in existing_orders]
+                logger.debug("After duplicate removal: %d rows", len(new_rows))
             
-            if new_df.empty:
+            if not new_rows:
                 logger.debug("No new data to append after duplicate removal")
                 return True
             
-            # Append new data
-            values = new_df.values.tolist()
-            body = {
-                'values': values
-            }
-            
-            logger.debug(f"Appending {len(values)} rows to sheet")
-            
-            # Get current row count before appending
-            current_row_count = len(existing_df) + 1  # +1 for header
-            
-            append_result = self.service.spreadsheets().values().append(
-                spreadsheetId=self.spreadsheet_id,
-                range=f"{self.tracking_sheet_name}!A:E",
-                valueInputOption='RAW',
-                insertDataOption='INSERT_ROWS',
-                body=body
-            ).execute()
-            logger.debug(f"Append result: {append_result}")
-            
-            # Setup checkbox validation only for the newly added rows
-            start_row = current_row_count + 1  # +1 because we're adding after existing data
-            end_row = current_row_count + len(values)
-            self._setup_checkbox_validation(start_row, end_row)
+            # Append new data together with the checkboxes for the new rows
+            logger.debug("Appending %d rows to sheet", len(new_rows))
+            append_result = self._append_rows(new_rows)
+            logger.debug("Append result: %s", append_result)
             
             return True
             
@@ -248,15 +319,19 @@ class GoogleSheetsService:
             raise Exception(f"Failed to append data to Google Sheet: {str(e)}")
     
     def _get_sheet_id(self) -> Optional[int]:
-        """Get the sheet ID for the tracking sheet"""
+        """Get the sheet ID for the tracking sheet (looked up once, then cached)"""
+        if self._sheet_id is not None:
+            return self._sheet_id
         try:
             spreadsheet = self.service.spreadsheets().get(
-                spreadsheetId=self.spreadsheet_id
+                spreadsheetId=self.spreadsheet_id,
+                fields='sheets.properties(sheetId,title)'
             ).execute()
             
             for sheet in spreadsheet['sheets']:
                 if sheet['properties']['title'] == self.tracking_sheet_name:
-                    return sheet['properties']['sheetId']
+                    self._sheet_id = sheet['properties']['sheetId']
+                    return self._sheet_id
             
             return None
         except Exception as e:
@@ -265,33 +340,25 @@ class GoogleSheetsService:
     
     def check_for_duplicate_orders(self, order_numbers: List[str]) -> List[str]:
         """Check which order numbers already exist in the sheet"""
-        existing_df = self._get_existing_data()
-        if existing_df.empty:
-            return []
-        
-        # Convert to string for comparison
-        existing_orders = existing_df['order_number'].astype(str).tolist()
-        duplicates = [order for order in order_numbers if str(order) in existing_orders]
-        return duplicates
+        existing_orders = self._get_existing_order_set()
+        return [order for order in order_numbers if str(order) in existing_orders]
 
-    def bulk_update_orders(self, order_tracking_pairs: List[Tuple[str, str]]) -> Tuple[int, int, int]:
+    def bulk_update_orders(self, order_tracking_pairs: Collection[Tuple[str, str]]) -> Tuple[int, int, int]:
         """
         Bulk update orders with tracking information
         Args:
-            order_tracking_pairs: List of tuples (order_number, tracking_number)
+            order_tracking_pairs: Collection of (order_number, tracking_number) tuples
         Returns:
             Tuple of (added_count, updated_count, skipped_count)
         """
         try:
-            logger.debug(f"Processing {len(order_tracking_pairs)} order/tracking pairs")
+            logger.debug("Processing %d order/tracking pairs", len(order_tracking_pairs))
             
-            # Get existing data
-            existing_df = self._get_existing_data()
-            today = datetime.now().strftime('%d-%m-%Y')
+            # Get existing order numbers and the sheet ID (single read of column A)
+            existing_rows, sheet_id = self._get_order_row_lookup()
+            today = self._get_today_str()
             
-            logger.debug(f"Existing data shape: {existing_df.shape}")
-            if not existing_df.empty:
-                logger.debug(f"Existing order numbers: {existing_df['order_number'].tolist()}")
+            logger.debug("Found %d existing orders in sheet", len(existing_rows))
             
             # Track statistics
             added_count = 0
@@ -312,29 +379,16 @@ class GoogleSheetsService:
                 if clean_order_number.startswith('#'):
                     clean_order_number = clean_order_number[1:]
                 
-                logger.debug(f"Processing order: '{clean_order_number}' with tracking: '{tracking_number}'")
+                logger.debug("Processing order: '%s' with tracking: '%s'", clean_order_number, tracking_number)
                 
-                tracking_link = self._generate_tracking_link(tracking_number)
+                tracking_link = TRACKING_LINK_PREFIX + tracking_number if tracking_number else ""
                 
-                # Check if order already exists - be more thorough with the search
-                existing_row_idx = None
-                if not existing_df.empty:
-                    # Clean existing order numbers for comparison
-                    existing_df_clean = existing_df.copy()
-                    existing_df_clean['clean_order'] = existing_df_clean['order_number'].astype(str).str.strip()
-                    existing_df_clean['clean_order'] = existing_df_clean['clean_order'].str.replace('#', '', regex=False)
-                    
-                    mask = existing_df_clean['clean_order'] == clean_order_number
-                    if mask.any():
-                        existing_row_idx = existing_df_clean[mask].index[0]
-                        logger.debug(f"Found existing order '{clean_order_number}' at pandas index {existing_row_idx}")
+                # Check if order already exists
+                row_number = existing_rows.get(clean_order_number)
                 
-                if existing_row_idx is not None:
+                if row_number is not None:
                     # Update existing row
-                    # Convert pandas index to Google Sheets row number
-                    # +2 because: +1 for header row, +1 to convert from 0-based to 1-based indexing
-                    row_number = existing_row_idx + 2
-                    logger.debug(f"Will update row {row_number} for order '{clean_order_number}'")
+                    logger.debug("Will update row %s for order '%s'", row_number, clean_order_number)
                     rows_to_update.append({
                         'row': row_number,
                         'order_number': clean_order_number,
@@ -345,30 +399,20 @@ class GoogleSheetsService:
                     updated_count += 1
                 else:
                     # Add new row
-                    logger.debug(f"Will add new row for order '{clean_order_number}'")
+                    logger.debug("Will add new row for order '%s'", clean_order_number)
                     rows_to_add.append([clean_order_number, tracking_number, today, tracking_link, False])
                     added_count += 1
             
             # Perform batch updates for existing rows
             if rows_to_update:
-                logger.debug(f"Updating {len(rows_to_update)} existing rows")
+                logger.debug("Updating %d existing rows", len(rows_to_update))
                 update_requests = []
                 for update_row in rows_to_update:
-                    logger.debug(f"Updating row {update_row['row']} with tracking: {update_row['tracking_number']}")
-                    # Update tracking number (column B)
-                    update_requests.append({
-                        'range': f"{self.tracking_sheet_name}!B{update_row['row']}",
-                        'values': [[update_row['tracking_number']]]
-                    })
-                    # Update date (column C)
+                    logger.debug("Updating row %s with tracking: %s", update_row['row'], update_row['tracking_number'])
+                    # Tracking number, date and tracking link are adjacent (columns B-D)
                     update_requests.append({
-                        'range': f"{self.tracking_sheet_name}!C{update_row['row']}",
-                        'values': [[update_row['date']]]
-                    })
-                    # Update tracking link (column D)
-                    update_requests.append({
-                        'range': f"{self.tracking_sheet_name}!D{update_row['row']}",
-                        'values': [[update_row['tracking_link']]]
+                        'range': f"{self.tracking_sheet_name}!B{update_row['row']}:D{update_row['row']}",
+                        'values': [[update_row['tracking_number'], update_row['date'], update_row['tracking_link']]]
                     })
                 
                 # Batch update
@@ -380,33 +424,15 @@ class GoogleSheetsService:
                     spreadsheetId=self.spreadsheet_id,
                     body=body
                 ).execute()
-                logger.debug(f"Batch update result: {update_result}")
+                logger.debug("Batch update result: %s", update_result)
             
-            # Append new rows
+            # Append new rows together with their checkboxes
             if rows_to_add:
-                logger.debug(f"Adding {len(rows_to_add)} new rows")
-                
-                # Get current row count before appending
-                current_row_count = len(existing_df) + 1  # +1 for header
-                
-                body = {
-                    'values': rows_to_add
-                }
-                append_result = self.service.spreadsheets().values().append(
-                    spreadsheetId=self.spreadsheet_id,
-                    range=f"{self.tracking_sheet_name}!A:E",
-                    valueInputOption='RAW',
-                    insertDataOption='INSERT_ROWS',
-                    body=body
-                ).execute()
-                logger.debug(f"Append result: {append_result}")
-                
-                # Setup checkbox validation only for the newly added rows
-                start_row = current_row_count + 1  # +1 because we're adding after existing data
-                end_row = current_row_count + len(rows_to_add)
-                self._setup_checkbox_validation(start_row, end_row)
+                logger.debug("Adding %d new rows", len(rows_to_add))
+                append_result = self._append_rows(rows_to_add, sheet_id)
+                logger.debug("Append result: %s", append_result)
             
-            logger.debug(f"Bulk update completed: {added_count} added, {updated_count} updated, {skipped_count} skipped")
+            logger.debug("Bulk update completed: %s added, %s updated, %s skipped", added_count, updated_count, skipped_count)
             return added_count, updated_count, skipped_count
             
         except Exception as e:
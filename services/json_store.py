@@ -0,0 +1,158 @@
+import json
+import os
+import threading
+from typing import Callable, List, Dict, Optional
+import logging
+
+# Prefer orjson for reading and writing data files; fall back to the json module
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+def _dumps(obj) -> bytes:
+    """Serialize to compact UTF-8 JSON bytes"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+def _dumps_snapshot(obj) -> bytes:
+    """Serialize to indented UTF-8 JSON bytes, keeping the tracked snapshot files readable and diffable"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    return json.dumps(obj, indent=2, ensure_ascii=False).encode('utf-8')
+
+def _loads(data: bytes):
+    """Parse UTF-8 JSON bytes"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+# Fold the mutation log into the snapshot once it grows past this size
+COMPACT_LOG_BYTES = 64 * 1024
+
+class JsonLogStore:
+    """Persists a list of records keyed by 'id' as a JSON snapshot plus an append-only log.
+    
+    Each add/update/delete is appended to the log as one JSON line, so a mutation costs one
+    small write instead of rewriting the whole file. The log is folded into the snapshot
+    on load and whenever it grows past COMPACT_LOG_BYTES. Callers change their in-memory
+    records only after the entry is written (the apply callback), so a failed write leaves
+    memory matching what is on disk.
+    """
+    
+    def __init__(self, data_file: str, record_key: str):
+        self.data_file = data_file
+        self.log_file = os.path.splitext(data_file)[0] + '.log'
+        # Name of the field holding the record in 'add' entries, e.g. 'carrier'
+        self.record_key = record_key
+        self._lock = threading.Lock()
+        
+        data_dir = os.path.dirname(self.data_file)
+        if data_dir:
+            os.makedirs(data_dir, exist_ok=True)
+    
+    def load(self) -> Optional[List[Dict]]:
+        """Return the stored records with the log replayed on top, or None if there is no snapshot yet"""
+        if not os.path.exists(self.data_file):
+            return None
+        
+        with open(self.data_file, 'rb') as f:
+            records = self._replay_log(_loads(f.read()))
+        # Start from a fresh snapshot, which also drops any torn line at the end of the log
+        if os.path.exists(self.log_file) and os.path.getsize(self.log_file) > 0:
+            try:
+                self.compact(records)
+            except OSError as e:
+                # The records were read fine; the log stays in place and is replayed again next time
+                logger.warning(f"Could not compact {self.data_file}: {str(e)}")
+        return records
+    
+    def _replay_log(self, records: List[Dict]) -> List[Dict]:
+        """Apply the logged mutations to a snapshot. Entries are idempotent, so replaying
+        a line that is already part of the snapshot is harmless."""
+        if not os.path.exists(self.log_file):
+            return records
+        
+        by_id = {record['id']: record for record in records}
+        with open(self.log_file, 'rb') as f:
+            for line_number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    entry = _loads(line)
+                except ValueError:
+                    # A torn final line from an interrupted write
+                    logger.warning(f"Skipping unreadable line {line_number} in {self.log_file}")
+                    continue
+                
+                op = entry.get('op')
+                if op == 'add':
+                    record = entry[self.record_key]
+                    by_id[record['id']] = record
+                elif op == 'update':
+                    record = by_id.get(entry['id'])
+                    if record is not None:
+                        record.update(entry['fields'])
+                elif op == 'delete':
+                    by_id.pop(entry['id'], None)
+        return list(by_id.values())
+    
+    def append(self, entry: Dict, records: List[Dict], apply: Optional[Callable[[], None]] = None):
+        """Append a single mutation, compacting the log once it gets large.
+        
+        entry is {'op': 'add', <record_key>: record}, {'op': 'update', 'id': ..., 'fields': {...}}
+        or {'op': 'delete', 'id': ...}; records is the full current list, written out on compaction.
+        apply makes the matching in-memory change; see append_many.
+        """
+        self.append_many([entry], records, apply)
+    
+    def append_many(self, entries: List[Dict], records: List[Dict], apply: Optional[Callable[[], None]] = None):
+        """Append several mutations with a single write and fsync.
+        
+        apply is called once the entries are on disk, and before any compaction snapshots
+        records, so callers change their in-memory state there. If the write fails it raises
+        without calling apply, leaving memory as it was.
+        """
+        with self._lock:
+            log_size = os.path.getsize(self.log_file) if os.path.exists(self.log_file) else 0
+            try:
+                with open(self.log_file, 'ab') as f:
+                    f.write(b''.join(_dumps(entry) + b'\n' for entry in entries))
+                    f.flush()
+                    os.fsync(f.fileno())
+            except OSError:
+                # Don't leave part of a failed batch behind to be replayed on the next load
+                try:
+                    os.truncate(self.log_file, log_size)
+                except OSError:
+                    pass
+                raise
+            
+            if apply is not None:
+                apply()
+            
+            if os.path.getsize(self.log_file) > COMPACT_LOG_BYTES:
+                try:
+                    self.compact(records)
+                except OSError as e:
+                    # The entries are safe in the log; compaction is retried on the next append
+                    logger.warning(f"Could not compact {self.data_file}: {str(e)}")
+    
+    def compact(self, records: List[Dict]):
+        """Write records as the new snapshot and empty the log"""
+        temp_file = f"{self.data_file}.tmp"
+        with open(temp_file, 'wb') as f:
+            f.write(_dumps_snapshot(records))
+            # The snapshot must be on disk before it replaces the old one
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, self.data_file)
+        # Truncate only after the snapshot is in place; a crash in between just replays
+        # entries the snapshot already contains
+        open(self.log_file, 'w').close()
+        logger.debug("Compacted %d records into %s", len(records), self.data_file)
@@ -1,10 +1,18 @@
 import logging
 import re
-from typing import Dict, Optional, Tuple, List
+import hashlib
+from typing import Callable, Dict, Optional, Tuple, List
 from PIL import Image
 import io
 import os
+import threading
 from io import BytesIO
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# Tesseract's OpenMP threading slows it down when several OCR jobs run at once, so keep
+# each recognition single-threaded (must be set before tesseract is loaded)
+os.environ.setdefault('OMP_THREAD_LIMIT', '1')
 
 # Try to import optional dependencies with graceful fallback
 try:
@@ -23,14 +31,55 @@ except ImportError:
     PYTESSERACT_AVAILABLE = False
     pytesseract = None
 
-logging.basicConfig(level=logging.DEBUG)
+# tesserocr runs tesseract in-process, so the language model is loaded once per worker
+# thread instead of once per pytesseract subprocess
+try:
+    import tesserocr
+    TESSEROCR_AVAILABLE = True
+except ImportError:
+    TESSEROCR_AVAILABLE = False
+    tesserocr = None
+
+# libjpeg-turbo decodes JPEG screenshots straight into a BGR array; TurboJPEG() raises
+# if the shared library itself is missing
+try:
+    from turbojpeg import TurboJPEG, TJPF_BGR
+    turbo_jpeg = TurboJPEG()
+    TURBOJPEG_AVAILABLE = True
+except (ImportError, OSError, RuntimeError):
+    TURBOJPEG_AVAILABLE = False
+    turbo_jpeg = None
+
+JPEG_SIGNATURE = b'\xff\xd8\xff'
+
+# Screenshots are downscaled so their longest side is at most this many pixels before OCR
+OCR_MAX_DIMENSION = 1600
+
+# A product line reads "<name> US=<price>" once OCR noise is trimmed from its ends
+PRODUCT_LINE_PATTERN = re.compile(r'^(.+?)\s+US=(\d+(?:\.\d{1,2})?)', re.IGNORECASE)
+LINE_NOISE_PATTERN = re.compile(r'^[|=\-~\s]+|[|=\-~\s]+$')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+NAME_PREFIX_NOISE_PATTERN = re.compile(r'^[|=\-~aq\s]+')
+
+# Number of recently processed screenshots whose OCR'd products are kept in memory
+OCR_CACHE_SIZE = 32
+
 logger = logging.getLogger(__name__)
 
+# Shared by all OCR jobs for cropping and PNG-encoding product images; both release the GIL
+crop_executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix='ocr-crop')
+
 class OCRService:
     def __init__(self):
         # Set tesseract path for Homebrew installation
         self._set_tesseract_path()
+        # tesseract's BaseAPI is not reentrant, so each OCR worker thread gets its own handle
+        self._local = threading.local()
+        self.use_tesserocr = False
         self.tesseract_available = self._check_tesseract()
+        # Image digest -> products read from it (names, prices, positions), least recently used first
+        self._products_cache = OrderedDict()
+        self._cache_lock = threading.Lock()
         
     def _set_tesseract_path(self):
         """Set tesseract path for different installation methods"""
@@ -55,9 +104,26 @@ class OCRService:
             logger.debug(f"Could not set tesseract path: {str(e)}")
             pass
         
+    def _get_api(self):
+        """Return this thread's persistent tesserocr API handle, creating it on first use"""
+        api = getattr(self._local, 'api', None)
+        if api is None:
+            api = tesserocr.PyTessBaseAPI(lang='eng', psm=tesserocr.PSM.SINGLE_BLOCK)
+            self._local.api = api
+        return api
+        
     def _check_tesseract(self) -> bool:
         """Check if tesseract is available"""
         try:
+            if TESSEROCR_AVAILABLE and CV2_AVAILABLE:
+                try:
+                    self._get_api()
+                    self.use_tesserocr = True
+                    logger.info("Tesseract OCR is available in-process via tesserocr")
+                    return True
+                except Exception as e:
+                    logger.warning(f"tesserocr could not start, falling back to pytesseract: {str(e)}")
+            
             if not PYTESSERACT_AVAILABLE:
                 logger.warning("pytesseract module not available")
                 return False
@@ -74,146 +140,322 @@ class OCRService:
             logger.warning(f"Tesseract not available: {str(e)}")
             return False
     
-    def extract_all_products(self, image_file) -> List[Dict[str, any]]:
+    def extract_all_products(self, image_file, image_path_factory: Callable[[], str] = None) -> List[Dict[str, any]]:
         """
         Extract ALL products from an image with their cropped images
-        Returns list of dicts with 'name', 'price', 'image_data', and 'error' keys
+        Returns list of dicts with 'name', 'price', 'image_path', and 'error' keys.
+        When image_path_factory is given, each product's crop is written as a PNG to the path
+        it returns; without it no crops are made and 'image_path' is None.
         """
         try:
             if not self.tesseract_available:
-                return [{'name': None, 'price': None, 'image_data': None, 
+                return [{'name': None, 'price': None, 'image_path': None, 
                         'error': 'OCR not available. Please install tesseract'}]
             
-            # Open and process the image
-            image = Image.open(image_file)
+            data = image_file.read()
+            img_cv = None
             
-            # Convert PIL to OpenCV format for processing
-            img_array = np.array(image)
-            if len(img_array.shape) == 3:
-                img_cv = cv2.cvtColor(img_array, cv2.COLOR_RGB2BGR)
+            # Re-uploading the same screenshot reuses the products read earlier instead of running OCR again
+            cache_key = hashlib.blake2b(data, digest_size=16).digest()
+            products_info = self._get_cached_products(cache_key)
+            if products_info is not None:
+                logger.info(f"Reusing {len(products_info)} products read from an identical image")
             else:
-                img_cv = img_array
-            
-            # Extract text with coordinate information
-            extracted_data = self._extract_text_with_coordinates(image)
-            
-            if not extracted_data['text']:
-                return [{'name': None, 'price': None, 'image_data': None,
-                        'error': 'No text could be extracted from the image'}]
-            
-            logger.debug(f"Extracted text: {extracted_data['text']}")
-            
-            # Find all products with their text positions
-            products_info = self._extract_multiple_products_with_positions(
-                extracted_data['text'], 
-                extracted_data.get('boxes', [])
-            )
-            
-            if not products_info:
-                return [{'name': None, 'price': None, 'image_data': None,
-                        'error': 'No products detected in the image'}]
+                # Decode straight into an OpenCV (BGR) array for cropping
+                img_cv = self._decode_image(data)
+                
+                # Extract text with coordinate information. Tesseract's run time grows with the
+                # pixel count, so large screenshots are read from a downscaled copy and the boxes
+                # are mapped back onto the full-resolution image used for cropping. Tesseract only
+                # reads luminance, so it gets a single-channel copy rather than an RGB one
+                ocr_image, scale = self._downscale_for_ocr(img_cv)
+                extracted_data = self._extract_text_with_coordinates(cv2.cvtColor(ocr_image, cv2.COLOR_BGR2GRAY))
+                if scale != 1.0:
+                    self._scale_boxes(extracted_data['boxes'], 1.0 / scale)
+                
+                if not extracted_data['text']:
+                    return [{'name': None, 'price': None, 'image_path': None,
+                            'error': 'No text could be extracted from the image'}]
+                
+                logger.debug(f"Extracted text: {extracted_data['text']}")
+                
+                # Find all products with their text positions
+                products_info = self._extract_multiple_products_with_positions(
+                    extracted_data['text'], 
+                    extracted_data.get('boxes', [])
+                )
+                
+                if not products_info:
+                    return [{'name': None, 'price': None, 'image_path': None,
+                            'error': 'No products detected in the image'}]
+                
+                self._assign_row_bands(products_info, img_cv.shape[0])
+                self._cache_products(cache_key, products_info)
             
-            # Process each product and crop its image
-            results = []
-            for i, product_info in enumerate(products_info):
-                try:
-                    # Crop the product image area
-                    cropped_image = self._crop_product_image(img_cv, product_info, i, len(products_info))
-                    
-                    # Convert cropped image to bytes for storage
-                    image_data = self._image_to_bytes(cropped_image)
-                    
-                    results.append({
-                        'name': product_info['name'],
-                        'price': product_info['price'],
-                        'image_data': image_data,
-                        'error': None
-                    })
-                except Exception as e:
-                    logger.error(f"Error processing product {i}: {str(e)}")
-                    results.append({
-                        'name': product_info['name'],
-                        'price': product_info['price'],
-                        'image_data': None,
-                        'error': f'Error cropping image: {str(e)}'
-                    })
+            if image_path_factory is None:
+                results = [{'name': product_info['name'], 'price': product_info['price'],
+                            'image_path': None, 'error': None}
+                           for product_info in products_info]
+            else:
+                if img_cv is None:
+                    img_cv = self._decode_image(data)
+                
+                # Crop and write each product's image in parallel, keeping the detected order
+                total_products = len(products_info)
+                futures = [crop_executor.submit(self._process_product, img_cv, product_info, i,
+                                                total_products, image_path_factory)
+                           for i, product_info in enumerate(products_info)]
+                results = [future.result() for future in futures]
             
             logger.info(f"Successfully extracted {len(results)} products")
             return results
             
         except Exception as e:
             logger.error(f"Error in OCR extraction: {str(e)}")
-            return [{'name': None, 'price': None, 'image_data': None,
+            return [{'name': None, 'price': None, 'image_path': None,
                     'error': f'OCR processing error: {str(e)}'}]
     
-    def _extract_text_with_coordinates(self, image: Image.Image) -> Dict:
-        """Extract text with bounding box coordinates"""
+    def _get_cached_products(self, cache_key: bytes) -> Optional[List[Dict]]:
+        """Return the products read from an image with this digest, if still cached"""
+        with self._cache_lock:
+            products_info = self._products_cache.get(cache_key)
+            if products_info is not None:
+                self._products_cache.move_to_end(cache_key)
+            return products_info
+    
+    def _cache_products(self, cache_key: bytes, products_info: List[Dict]):
+        """Remember the products read from an image, evicting the least recently used entry"""
+        with self._cache_lock:
+            self._products_cache[cache_key] = products_info
+            self._products_cache.move_to_end(cache_key)
+            while len(self._products_cache) > OCR_CACHE_SIZE:
+                self._products_cache.popitem(last=False)
+    
+    def _process_product(self, img_cv: np.ndarray, product_info: Dict, product_index: int, total_products: int,
+                         image_path_factory: Callable[[], str]) -> Dict:
+        """Crop one detected product out of the screenshot and write it as a PNG"""
+        try:
+            # Crop the product image area
+            cropped_image = self._crop_product_image(img_cv, product_info, product_index, total_products)
+            
+            # Encode the crop straight to its file
+            image_path = image_path_factory()
+            self._save_png(cropped_image, image_path)
+            
+            return {
+                'name': product_info['name'],
+                'price': product_info['price'],
+                'image_path': image_path,
+                'error': None
+            }
+        except Exception as e:
+            logger.error(f"Error processing product {product_index}: {str(e)}")
+            return {
+                'name': product_info['name'],
+                'price': product_info['price'],
+                'image_path': None,
+                'error': f'Error cropping image: {str(e)}'
+            }
+    
+    def _decode_image(self, data: bytes) -> np.ndarray:
+        """Decode image bytes into a 3-channel BGR array"""
+        if TURBOJPEG_AVAILABLE and data.startswith(JPEG_SIGNATURE):
+            return turbo_jpeg.decode(data, pixel_format=TJPF_BGR)
+        
+        img_cv = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        if img_cv is None:
+            # Formats OpenCV can't read (e.g. GIF) go through PIL
+            image = Image.open(BytesIO(data)).convert('RGB')
+            img_cv = cv2.cvtColor(np.asarray(image), cv2.COLOR_RGB2BGR)
+        return img_cv
+    
+    def _downscale_for_ocr(self, img_cv: np.ndarray) -> Tuple[np.ndarray, float]:
+        """Shrink an image so its longest side fits OCR_MAX_DIMENSION; returns the image and the scale used"""
+        height, width = img_cv.shape[:2]
+        scale = OCR_MAX_DIMENSION / max(height, width)
+        if scale >= 1.0:
+            return img_cv, 1.0
+        
+        resized = cv2.resize(img_cv, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        logger.debug("Downscaled %dx%d screenshot to %dx%d for OCR", width, height, resized.shape[1], resized.shape[0])
+        return resized, scale
+    
+    def _scale_boxes(self, boxes: Dict, factor: float):
+        """Scale bounding box coordinates in place"""
+        for key in ('left', 'top', 'width', 'height'):
+            if key in boxes:
+                boxes[key] = [int(round(value * factor)) for value in boxes[key]]
+    
+    def _extract_text_with_coordinates(self, image: np.ndarray) -> Dict:
+        """Extract text with bounding box coordinates from a grayscale image array"""
         try:
+            if self.use_tesserocr:
+                # One recognition pass gives both the text and the line boxes
+                api = self._get_api()
+                height, width = image.shape[:2]
+                try:
+                    api.SetImageBytes(image.tobytes(), width, height, 1, width)
+                    # SetImageBytes only loads the image; the result iterator is empty until it is recognized
+                    api.Recognize()
+                    boxes = self._get_line_boxes(api)
+                finally:
+                    api.Clear()
+                
+                return {
+                    'text': '\n'.join(boxes['text']),
+                    'boxes': boxes
+                }
+            
             if not PYTESSERACT_AVAILABLE:
                 raise Exception("pytesseract not available")
-                
-            # Convert to RGB if necessary
-            if image.mode != 'RGB':
-                image = image.convert('RGB')
             
-            # Get text with bounding boxes
-            data = pytesseract.image_to_data(image, output_type=pytesseract.Output.DICT)
-            text = pytesseract.image_to_string(image, config='--psm 6')
+            # Get words with bounding boxes from a single OCR pass, then rebuild the plain text
+            # and the line boxes from them instead of running tesseract a second time
+            data = pytesseract.image_to_data(image, config='--psm 6', output_type=pytesseract.Output.DICT)
+            
+            boxes = {'left': [], 'top': [], 'width': [], 'height': [], 'text': []}
+            words = []
+            current_line = None
+            line_box = None
+            for block_num, par_num, line_num, word, left, top, word_width, word_height in zip(
+                    data['block_num'], data['par_num'], data['line_num'], data['text'],
+                    data['left'], data['top'], data['width'], data['height']):
+                word = word.strip()
+                if not word:
+                    continue
+                line_key = (block_num, par_num, line_num)
+                if line_key != current_line:
+                    if words:
+                        self._add_line_box(boxes, ' '.join(words), line_box)
+                    words = []
+                    current_line = line_key
+                    line_box = [left, top, left + word_width, top + word_height]
+                else:
+                    line_box = [min(line_box[0], left), min(line_box[1], top),
+                                max(line_box[2], left + word_width), max(line_box[3], top + word_height)]
+                words.append(word)
+            if words:
+                self._add_line_box(boxes, ' '.join(words), line_box)
             
             return {
-                'text': text.strip(),
-                'boxes': data
+                'text': '\n'.join(boxes['text']),
+                'boxes': boxes
             }
             
         except Exception as e:
             logger.error(f"Error extracting text with coordinates: {str(e)}")
             return {'text': '', 'boxes': []}
     
+    def _add_line_box(self, boxes: Dict, line_text: str, bbox) -> None:
+        """Append one text line and its (x1, y1, x2, y2) bounding box to a line boxes dict"""
+        x1, y1, x2, y2 = bbox
+        boxes['left'].append(x1)
+        boxes['top'].append(y1)
+        boxes['width'].append(x2 - x1)
+        boxes['height'].append(y2 - y1)
+        boxes['text'].append(line_text)
+    
+    def _get_line_boxes(self, api) -> Dict:
+        """Collect text lines and their bounding boxes from a tesserocr API that has already recognized an image"""
+        boxes = {'left': [], 'top': [], 'width': [], 'height': [], 'text': []}
+        level = tesserocr.RIL.TEXTLINE
+        for line in tesserocr.iterate_level(api.GetIterator(), level):
+            bbox = line.BoundingBox(level)
+            line_text = line.GetUTF8Text(level)
+            if not bbox or not line_text or not line_text.strip():
+                continue
+            self._add_line_box(boxes, line_text.strip(), bbox)
+        return boxes
+    
     def _extract_multiple_products_with_positions(self, text: str, boxes: Dict) -> List[Dict]:
         """Extract multiple products with their approximate positions"""
         products = []
         lines = [line.strip() for line in text.split('\n') if line.strip()]
         
-        # Look for lines that contain both product names and prices
-        product_pattern = r'^(.+?)\s+US=(\d+(?:\.\d{1,2})?)'
+        # Line boxes line up with the text lines when both come from the same OCR pass
+        line_tops = boxes.get('top', []) if isinstance(boxes, dict) else []
+        line_heights = boxes.get('height', []) if isinstance(boxes, dict) else []
+        has_positions = len(line_tops) == len(lines) and len(line_heights) == len(lines)
         
+        # Look for lines that contain both product names and prices
         for line_idx, line in enumerate(lines):
+            # Most lines have no "US=" price at all; skip them before any regex work
+            if '=' not in line:
+                continue
+            
             # Clean the line
-            cleaned_line = re.sub(r'^[|=\-~\s]*', '', line)
-            cleaned_line = re.sub(r'[|=\-~\s]*$', '', cleaned_line)
-            cleaned_line = re.sub(r'\s+', ' ', cleaned_line).strip()
+            cleaned_line = LINE_NOISE_PATTERN.sub('', line)
+            cleaned_line = WHITESPACE_PATTERN.sub(' ', cleaned_line).strip()
             
             # Try to match product name + price pattern
-            match = re.search(product_pattern, cleaned_line, re.IGNORECASE)
+            match = PRODUCT_LINE_PATTERN.match(cleaned_line)
             if match:
                 product_name = match.group(1).strip()
                 price_str = match.group(2)
                 
                 # Clean up the product name further
-                product_name = re.sub(r'^[|=\-~aq\s]*', '', product_name)
+                product_name = NAME_PREFIX_NOISE_PATTERN.sub('', product_name)
                 product_name = product_name.strip()
                 
                 if len(product_name) > 3:  # Valid product name
                     try:
                         price_float = float(price_str)
-                        products.append({
+                        product = {
                             'name': product_name,
                             'price': f"{price_float:.2f}",
                             'line_index': line_idx,
                             'y_position': line_idx  # Approximate vertical position
-                        })
+                        }
+                        if has_positions:
+                            # Pixel extent of the product's text line
+                            product['top'] = line_tops[line_idx]
+                            product['bottom'] = line_tops[line_idx] + line_heights[line_idx]
+                        products.append(product)
                     except ValueError:
                         continue
         
-        logger.debug(f"Found {len(products)} products: {products}")
+        logger.debug("Found %d products: %s", len(products), products)
         return products
     
+    def _assign_row_bands(self, products_info: List[Dict], image_height: int) -> None:
+        """
+        Work out each product's table row from where its text line sits: rows are split halfway
+        between neighbouring product lines. Sets 'y_start'/'y_end' when the products have
+        positions and run top to bottom; otherwise cropping falls back to even row estimates.
+        """
+        if len(products_info) < 2 or any('top' not in product_info for product_info in products_info):
+            return
+        
+        centers = [(product_info['top'] + product_info['bottom']) / 2 for product_info in products_info]
+        if any(below <= above for above, below in zip(centers, centers[1:])):
+            return
+        
+        last = len(centers) - 1
+        for i, product_info in enumerate(products_info):
+            # The first and last rows mirror the gap to their only neighbour
+            above = (centers[i] - centers[i - 1]) / 2 if i > 0 else (centers[1] - centers[0]) / 2
+            below = (centers[i + 1] - centers[i]) / 2 if i < last else (centers[i] - centers[i - 1]) / 2
+            product_info['y_start'] = max(0, int(centers[i] - above))
+            product_info['y_end'] = min(image_height, int(round(centers[i] + below)))
+    
     def _crop_product_image(self, img_cv: np.ndarray, product_info: Dict, product_index: int, total_products: int) -> np.ndarray:
         """
         Crop the product image from the screenshot based on layout analysis
         """
         height, width = img_cv.shape[:2]
         
+        # Assume product image is in the left portion of each row
+        # Typical table layout: [Image] [Name] [Price]
+        image_width_ratio = 0.3  # Image takes up ~30% of width
+        padding = 10
+        
+        if 'y_start' in product_info:
+            # The row located from the OCR line positions
+            cropped = img_cv[product_info['y_start']:product_info['y_end'],
+                             0:min(width, int(width * image_width_ratio) + padding)]
+            logger.debug("Cropped product %d: size %s", product_index, cropped.shape)
+            return cropped
+        
         # Estimate product image area based on table layout
         # Assuming products are arranged vertically in a table
         
@@ -224,14 +466,10 @@ class OCRService:
         y_start = max(0, product_index * row_height)
         y_end = min(height, (product_index + 1) * row_height)
         
-        # Assume product image is in the left portion of each row
-        # Typical table layout: [Image] [Name] [Price]
-        image_width_ratio = 0.3  # Image takes up ~30% of width
         x_start = 0
         x_end = min(width, int(width * image_width_ratio))
         
         # Add some padding
-        padding = 10
         y_start = max(0, y_start - padding)
         y_end = min(height, y_end + padding)
         x_start = max(0, x_start)
@@ -251,18 +489,12 @@ class OCRService:
         logger.debug(f"Cropped product {product_index}: size {cropped.shape}")
         return cropped
     
-    def _image_to_bytes(self, img_cv: np.ndarray) -> bytes:
-        """Convert OpenCV image to bytes"""
-        # Convert BGR to RGB
-        img_rgb = cv2.cvtColor(img_cv, cv2.COLOR_BGR2RGB)
-        
-        # Convert to PIL Image
-        pil_image = Image.fromarray(img_rgb)
-        
-        # Convert to bytes
-        byte_io = BytesIO()
-        pil_image.save(byte_io, format='PNG')
-        return byte_io.getvalue()
+    def _save_png(self, img_cv: np.ndarray, image_path: str):
+        """Encode an OpenCV image as PNG directly to a file"""
+        # The lowest zlib level is much cheaper and the crops are small enough that the
+        # extra bytes don't matter
+        if not cv2.imwrite(image_path, img_cv, [cv2.IMWRITE_PNG_COMPRESSION, 1]):
+            raise ValueError(f"Could not write PNG image to {image_path}")
     
     # Keep the original single product method for backward compatibility
     def extract_product_info(self, image_file) -> Dict[str, Optional[str]]:
@@ -1,46 +1,57 @@
-import json
 import os
 import uuid
-from typing import List, Dict, Optional
-from werkzeug.utils import secure_filename
+from datetime import datetime
+from typing import Callable, List, Dict, Optional
 import logging
 
-logging.basicConfig(level=logging.DEBUG)
+from services.json_store import JsonLogStore
+from config import IMAGE_EXTENSIONS
+
 logger = logging.getLogger(__name__)
 
 class ProductService:
     def __init__(self):
         self.products_file = 'data/products.json'
         self.images_folder = 'static/product_images'
-        self.allowed_extensions = {'png', 'jpg', 'jpeg', 'gif'}
+        self.allowed_extensions = IMAGE_EXTENSIONS
         
         # Ensure directories exist
         os.makedirs('data', exist_ok=True)
         os.makedirs(self.images_folder, exist_ok=True)
         
-        # Initialize products file if it doesn't exist
-        if not os.path.exists(self.products_file):
-            self._save_products([])
+        # Mutations are appended to a log next to products_file instead of rewriting it
+        self._store = JsonLogStore(self.products_file, 'product')
+        self.log_file = self._store.log_file
+        self.products = self._load_products()
+        # Same dicts as self.products, indexed for O(1) lookups
+        self._by_id = {product['id']: product for product in self.products}
+        # Products newest first, kept in order as products are added and removed
+        self._newest_first = sorted(self.products, key=lambda x: x.get('created_at', ''), reverse=True)
+        # Product ID -> lowercased name, for search
+        self._search_names = {product['id']: product['name'].lower() for product in self.products}
     
     def _allowed_file(self, filename: str) -> bool:
         """Check if file extension is allowed"""
-        return '.' in filename and \
-               filename.rsplit('.', 1)[1].lower() in self.allowed_extensions
+        return os.path.splitext(filename)[1].lower() in self.allowed_extensions
     
     def _load_products(self) -> List[Dict]:
-        """Load products from JSON file"""
+        """Load products from the JSON snapshot and its mutation log"""
         try:
-            with open(self.products_file, 'r') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
+            products = self._store.load()
+            if products is None:
+                # Initialize products file if it doesn't exist
+                products = []
+                self._store.compact(products)
+            return products
+        except (OSError, ValueError):
             logger.warning("Could not load products file, returning empty list")
             return []
     
-    def _save_products(self, products: List[Dict]) -> None:
-        """Save products to JSON file"""
+    def _save_changes(self, entries: List[Dict], apply: Callable[[], None]) -> None:
+        """Persist a batch of add/update/delete entries with one log write, then make the matching
+        in-memory change with apply. A failed write raises before apply runs, so memory stays as saved."""
         try:
-            with open(self.products_file, 'w') as f:
-                json.dump(products, f, indent=2)
+            self._store.append_many(entries, self.products, apply)
         except Exception as e:
             logger.error(f"Failed to save products: {str(e)}")
             raise Exception(f"Failed to save products: {str(e)}")
@@ -60,9 +71,9 @@ class ProductService:
             
             # Generate unique ID and filename
             product_id = str(uuid.uuid4())
-            filename = secure_filename(image_file.filename)
-            file_extension = filename.rsplit('.', 1)[1].lower()
-            unique_filename = f"{product_id}.{file_extension}"
+            # The extension was checked by _allowed_file; the stored name never uses the upload's name
+            file_extension = os.path.splitext(image_file.filename)[1].lower()
+            unique_filename = f"{product_id}{file_extension}"
             
             # Save image file
             image_path = os.path.join(self.images_folder, unique_filename)
@@ -80,10 +91,11 @@ class ProductService:
                 'created_at': self._get_current_timestamp()
             }
             
-            # Load existing products and add new one
-            products = self._load_products()
-            products.append(product)
-            self._save_products(products)
+            try:
+                self._insert_products([product])
+            except Exception:
+                self.discard_image(image_path)
+                raise
             
             logger.info(f"Added new product: {product_name} - NZD ${price_nzd}")
             return product
@@ -92,44 +104,58 @@ class ProductService:
             logger.error(f"Failed to add product: {str(e)}")
             raise Exception(f"Failed to add product: {str(e)}")
     
+    def _insert_products(self, products: List[Dict]) -> None:
+        """Log newly created products, then store them"""
+        def apply():
+            self.products.extend(products)
+            for product in products:
+                self._by_id[product['id']] = product
+                self._search_names[product['id']] = product['name'].lower()
+            
+            # New products normally carry the latest timestamps and just go on the front;
+            # otherwise (e.g. the clock moved back) fall back to a full sort
+            newest = self._newest_first[0].get('created_at', '') if self._newest_first else ''
+            if all(product.get('created_at', '') >= newest for product in products):
+                self._newest_first[:0] = sorted(products, key=lambda x: x.get('created_at', ''), reverse=True)
+            else:
+                self._newest_first = sorted(self.products, key=lambda x: x.get('created_at', ''), reverse=True)
+        
+        self._save_changes([{'op': 'add', 'product': product} for product in products], apply)
+    
     def get_all_products(self) -> List[Dict]:
         """Get all products sorted by creation date (newest first)"""
-        products = self._load_products()
-        return sorted(products, key=lambda x: x.get('created_at', ''), reverse=True)
+        return list(self._newest_first)
     
     def search_products(self, search_term: str) -> List[Dict]:
         """Search products by name"""
         if not search_term:
             return self.get_all_products()
         
-        products = self.get_all_products()
         search_term = search_term.lower()
-        
-        return [p for p in products if search_term in p['name'].lower()]
+        search_names = self._search_names
+        # A product deleted mid-scan has already left search_names; its '' never matches
+        return [product for product in self._newest_first if search_term in search_names.get(product['id'], '')]
     
     def delete_product(self, product_id: str) -> bool:
         """Delete a product by ID"""
         try:
-            products = self._load_products()
-            product_to_delete = None
-            
-            # Find the product
-            for product in products:
-                if product['id'] == product_id:
-                    product_to_delete = product
-                    break
+            product_to_delete = self._by_id.get(product_id)
             
             if not product_to_delete:
                 raise ValueError(f"Product with ID {product_id} not found")
             
-            # Remove image file
-            image_path = os.path.join(self.images_folder, product_to_delete['image'])
-            if os.path.exists(image_path):
-                os.remove(image_path)
+            def apply():
+                # Another request may have deleted it while this one was writing
+                if self._by_id.pop(product_id, None) is None:
+                    return
+                self.products.remove(product_to_delete)
+                self._newest_first.remove(product_to_delete)
+                del self._search_names[product_id]
+            
+            self._save_changes([{'op': 'delete', 'id': product_id}], apply)
             
-            # Remove from products list
-            products = [p for p in products if p['id'] != product_id]
-            self._save_products(products)
+            # Remove the image only once the delete is saved
+            self.discard_image(os.path.join(self.images_folder, product_to_delete['image']))
             
             logger.info(f"Deleted product: {product_to_delete['name']}")
             return True
@@ -140,55 +166,65 @@ class ProductService:
     
     def _get_current_timestamp(self) -> str:
         """Get current timestamp as ISO string"""
-        from datetime import datetime
         return datetime.now().isoformat()
     
     def get_product_by_id(self, product_id: str) -> Optional[Dict]:
         """Get a specific product by ID"""
-        products = self._load_products()
-        for product in products:
-            if product['id'] == product_id:
-                return product
-        return None
+        return self._by_id.get(product_id)
     
-    def add_product_from_bytes(self, image_bytes: bytes, product_name: str, price_nzd: float, file_extension: str = 'png', listing_link: str = None, sourcing_type: str = None, sourcing_data: str = None) -> Dict:
-        """Add a new product to the catalog using image bytes (for OCR-cropped images)"""
-        try:
-            # Validate inputs
-            if not image_bytes:
-                raise ValueError("No image data provided")
-            
-            if not product_name or not product_name.strip():
-                raise ValueError("Product name is required")
-            
-            if price_nzd <= 0:
-                raise ValueError("Price must be greater than 0")
-            
+    def new_image_path(self, file_extension: str = 'png') -> str:
+        """Return a fresh path in the images folder for a product image written by the caller
+        (see add_products); the file name doubles as the product's ID"""
+        return os.path.join(self.images_folder, f"{uuid.uuid4()}.{file_extension}")
+    
+    def _create_product(self, product_name: str, price_nzd: float, image_bytes: bytes = None, file_extension: str = 'png', image_path: str = None, listing_link: str = None, sourcing_type: str = None, sourcing_data: str = None) -> Dict:
+        """Validate a product, save its image and return the new (not yet stored) product.
+        The image is either image_bytes or a file already written to image_path."""
+        # Validate inputs
+        if not image_bytes and not image_path:
+            raise ValueError("No image data provided")
+        
+        if not product_name or not product_name.strip():
+            raise ValueError("Product name is required")
+        
+        if price_nzd <= 0:
+            raise ValueError("Price must be greater than 0")
+        
+        if image_path:
+            # Already in the images folder under a name from new_image_path
+            unique_filename = os.path.basename(image_path)
+            product_id = os.path.splitext(unique_filename)[0]
+        else:
             # Generate unique ID and filename
             product_id = str(uuid.uuid4())
             unique_filename = f"{product_id}.{file_extension}"
             
             # Save image file from bytes
-            image_path = os.path.join(self.images_folder, unique_filename)
-            with open(image_path, 'wb') as f:
+            with open(os.path.join(self.images_folder, unique_filename), 'wb') as f:
                 f.write(image_bytes)
-            
-            # Create product object
-            product = {
-                'id': product_id,
-                'name': product_name.strip(),
-                'price_nzd': float(price_nzd),
-                'image': unique_filename,
-                'listing_link': listing_link.strip() if listing_link and listing_link.strip() else None,
-                'sourcing_type': sourcing_type if sourcing_type in ['link', 'agent'] else None,
-                'sourcing_data': sourcing_data.strip() if sourcing_data and sourcing_data.strip() else None,
-                'created_at': self._get_current_timestamp()
-            }
-            
-            # Load existing products and add new one
-            products = self._load_products()
-            products.append(product)
-            self._save_products(products)
+        
+        # Create product object
+        return {
+            'id': product_id,
+            'name': product_name.strip(),
+            'price_nzd': float(price_nzd),
+            'image': unique_filename,
+            'listing_link': listing_link.strip() if listing_link and listing_link.strip() else None,
+            'sourcing_type': sourcing_type if sourcing_type in ['link', 'agent'] else None,
+            'sourcing_data': sourcing_data.strip() if sourcing_data and sourcing_data.strip() else None,
+            'created_at': self._get_current_timestamp()
+        }
+    
+    def add_product_from_bytes(self, image_bytes: bytes, product_name: str, price_nzd: float, file_extension: str = 'png', listing_link: str = None, sourcing_type: str = None, sourcing_data: str = None) -> Dict:
+        """Add a new product to the catalog using image bytes (for OCR-cropped images)"""
+        try:
+            product = self._create_product(product_name, price_nzd, image_bytes=image_bytes, file_extension=file_extension,
+                                           listing_link=listing_link, sourcing_type=sourcing_type, sourcing_data=sourcing_data)
+            try:
+                self._insert_products([product])
+            except Exception:
+                self.discard_image(os.path.join(self.images_folder, product['image']))
+                raise
             
             logger.info(f"Added new product from bytes: {product_name} - NZD ${price_nzd}")
             return product
@@ -197,63 +233,97 @@ class ProductService:
             logger.error(f"Failed to add product from bytes: {str(e)}")
             raise Exception(f"Failed to add product from bytes: {str(e)}")
     
+    def add_products(self, items: List[Dict]) -> List[Dict]:
+        """Add several products (one OCR screenshot) and save them in one write.
+        
+        Each item holds product_name and price_nzd plus either image_bytes (and file_extension)
+        or the image_path of a file already written there via new_image_path. Items that fail
+        validation are logged and skipped; the products that were added are returned in order.
+        """
+        products = []
+        for item in items:
+            try:
+                products.append(self._create_product(**item))
+            except Exception as e:
+                logger.error(f"Failed to add product: {str(e)}")
+                self.discard_image(item.get('image_path'))
+        
+        if products:
+            try:
+                self._insert_products(products)
+            except Exception as e:
+                # Nothing was stored, so the images written for the products are orphans
+                for product in products:
+                    self.discard_image(os.path.join(self.images_folder, product['image']))
+                raise Exception(f"Failed to add products: {str(e)}")
+            logger.info(f"Added {len(products)} new products")
+        return products
+    
+    def discard_image(self, image_path: Optional[str]) -> None:
+        """Remove an image file that no product uses (e.g. one written via new_image_path)"""
+        if image_path and os.path.exists(image_path):
+            os.remove(image_path)
+    
     def update_product(self, product_id: str, new_name: str = None, new_price: float = None, new_image_file=None, new_listing_link: str = None, new_sourcing_type: str = None, new_sourcing_data: str = None) -> Dict:
         """Update an existing product"""
         try:
-            products = self._load_products()
-            product_to_update = None
-            product_index = -1
-            
-            # Find the product
-            for i, product in enumerate(products):
-                if product['id'] == product_id:
-                    product_to_update = product
-                    product_index = i
-                    break
+            product_to_update = self._by_id.get(product_id)
             
             if not product_to_update:
                 raise ValueError(f"Product with ID {product_id} not found")
             
+            # Collect the changes first so a rejected update leaves the stored product untouched
+            fields = {}
+            
             # Update name if provided
             if new_name and new_name.strip():
-                product_to_update['name'] = new_name.strip()
+                fields['name'] = new_name.strip()
             
             # Update price if provided
             if new_price is not None:
                 if new_price <= 0:
                     raise ValueError("Price must be greater than 0")
-                product_to_update['price_nzd'] = float(new_price)
+                fields['price_nzd'] = float(new_price)
             
             # Update listing link if provided (allow empty string to clear the link)
             if new_listing_link is not None:
-                product_to_update['listing_link'] = new_listing_link.strip() if new_listing_link.strip() else None
+                fields['listing_link'] = new_listing_link.strip() if new_listing_link.strip() else None
             
             # Update sourcing if provided
             if new_sourcing_type is not None:
-                product_to_update['sourcing_type'] = new_sourcing_type if new_sourcing_type in ['link', 'agent'] else None
+                fields['sourcing_type'] = new_sourcing_type if new_sourcing_type in ['link', 'agent'] else None
             if new_sourcing_data is not None:
-                product_to_update['sourcing_data'] = new_sourcing_data.strip() if new_sourcing_data.strip() else None
+                fields['sourcing_data'] = new_sourcing_data.strip() if new_sourcing_data.strip() else None
             
             # Update image if provided
+            new_image_path = None
             if new_image_file and self._allowed_file(new_image_file.filename):
-                # Remove old image file
-                old_image_path = os.path.join(self.images_folder, product_to_update['image'])
-                if os.path.exists(old_image_path):
-                    os.remove(old_image_path)
-                
-                # Save new image
-                filename = secure_filename(new_image_file.filename)
-                file_extension = filename.rsplit('.', 1)[1].lower()
-                unique_filename = f"{product_id}.{file_extension}"
+                # Save new image under a fresh name so browsers don't keep showing a cached old image
+                file_extension = os.path.splitext(new_image_file.filename)[1].lower()
+                unique_filename = f"{product_id}-{uuid.uuid4().hex[:8]}{file_extension}"
                 
-                image_path = os.path.join(self.images_folder, unique_filename)
-                new_image_file.save(image_path)
+                new_image_path = os.path.join(self.images_folder, unique_filename)
+                new_image_file.save(new_image_path)
                 
-                product_to_update['image'] = unique_filename
+                fields['image'] = unique_filename
+            
+            old_image = product_to_update['image']
+            
+            def apply():
+                product_to_update.update(fields)
+                if 'name' in fields:
+                    self._search_names[product_id] = fields['name'].lower()
+            
+            # Log only the changed fields
+            try:
+                self._save_changes([{'op': 'update', 'id': product_id, 'fields': fields}], apply)
+            except Exception:
+                self.discard_image(new_image_path)
+                raise
             
-            # Update the product in the list
-            products[product_index] = product_to_update
-            self._save_products(products)
+            # The old image can go once the product no longer points at it
+            if new_image_path:
+                self.discard_image(os.path.join(self.images_folder, old_image))
             
             logger.info(f"Updated product: {product_to_update['name']}")
             return product_to_update
@@ -1,102 +1,103 @@
-import json
 import os
 from datetime import datetime
 from typing import List, Dict, Optional
 import uuid
 
+from services.json_store import JsonLogStore
+
 class TodoService:
     def __init__(self):
         self.data_dir = 'data'
         self.todos_file = os.path.join(self.data_dir, 'todos.json')
-        self._ensure_data_file()
-    
-    def _ensure_data_file(self):
-        """Ensure the data directory and todos file exist"""
-        if not os.path.exists(self.data_dir):
-            os.makedirs(self.data_dir)
-        
-        if not os.path.exists(self.todos_file):
-            with open(self.todos_file, 'w') as f:
-                json.dump([], f)
+        # Mutations are appended to a log next to todos_file instead of rewriting it
+        self._store = JsonLogStore(self.todos_file, 'todo')
+        self.log_file = self._store.log_file
+        self.todos = self._load_todos()
+        # Same dicts as self.todos, indexed for O(1) lookups
+        self._by_id = {todo['id']: todo for todo in self.todos}
+        # Kept up to date on every mutation so stats never rescan
+        self._completed_count = sum(1 for todo in self.todos if todo.get('completed', False))
     
     def _load_todos(self) -> List[Dict]:
-        """Load todos from JSON file"""
+        """Load todos from the JSON snapshot and its mutation log"""
         try:
-            with open(self.todos_file, 'r') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
+            todos = self._store.load()
+            if todos is None:
+                todos = []
+                self._store.compact(todos)
+            return todos
+        except (OSError, ValueError):
             return []
     
-    def _save_todos(self, todos: List[Dict]):
-        """Save todos to JSON file"""
-        with open(self.todos_file, 'w') as f:
-            json.dump(todos, f, indent=2, default=str)
-    
     def create_todo(self, title: str, description: str = "") -> Dict:
         """Create a new todo note"""
+        now = datetime.now().isoformat()
         todo = {
             'id': str(uuid.uuid4()),
             'title': title,
             'description': description,
             'completed': False,
-            'created_at': datetime.now().isoformat(),
-            'updated_at': datetime.now().isoformat()
+            'created_at': now,
+            'updated_at': now
         }
         
-        todos = self._load_todos()
-        todos.append(todo)
-        self._save_todos(todos)
+        def apply():
+            self.todos.append(todo)
+            self._by_id[todo['id']] = todo
+        
+        # Memory only changes once the entry is saved
+        self._store.append({'op': 'add', 'todo': todo}, self.todos, apply)
         
         return todo
     
     def get_all_todos(self) -> List[Dict]:
         """Get all todos"""
-        return self._load_todos()
+        return list(self.todos)
     
     def get_active_todos(self) -> List[Dict]:
         """Get all non-completed todos"""
-        todos = self._load_todos()
-        return [todo for todo in todos if not todo.get('completed', False)]
+        return [todo for todo in self.todos if not todo.get('completed', False)]
     
     def get_todo_by_id(self, todo_id: str) -> Optional[Dict]:
         """Get a specific todo by ID"""
-        todos = self._load_todos()
-        return next((todo for todo in todos if todo['id'] == todo_id), None)
+        return self._by_id.get(todo_id)
     
     def update_todo(self, todo_id: str, title: str = None, description: str = None) -> bool:
         """Update a todo's title and/or description"""
-        todos = self._load_todos()
-        
-        for todo in todos:
-            if todo['id'] == todo_id:
-                if title is not None:
-                    todo['title'] = title
-                if description is not None:
-                    todo['description'] = description
-                todo['updated_at'] = datetime.now().isoformat()
-                self._save_todos(todos)
-                return True
+        todo = self._by_id.get(todo_id)
+        if todo is None:
+            return False
         
-        return False
+        fields = {'updated_at': datetime.now().isoformat()}
+        if title is not None:
+            fields['title'] = title
+        if description is not None:
+            fields['description'] = description
+        self._store.append({'op': 'update', 'id': todo_id, 'fields': fields}, self.todos,
+                           lambda: todo.update(fields))
+        return True
     
     def delete_todo(self, todo_id: str) -> bool:
         """Delete a todo permanently"""
-        todos = self._load_todos()
-        original_length = len(todos)
-        
-        todos = [todo for todo in todos if todo['id'] != todo_id]
+        todo = self._by_id.get(todo_id)
+        if todo is None:
+            return False
         
-        if len(todos) < original_length:
-            self._save_todos(todos)
-            return True
+        def apply():
+            # Another request may have deleted it while this one was writing
+            if self._by_id.pop(todo_id, None) is None:
+                return
+            self.todos.remove(todo)
+            if todo.get('completed', False):
+                self._completed_count -= 1
         
-        return False
+        self._store.append({'op': 'delete', 'id': todo_id}, self.todos, apply)
+        return True
     
     def get_todo_stats(self) -> Dict:
         """Get statistics about todos"""
-        todos = self._load_todos()
-        total = len(todos)
-        completed = sum(1 for todo in todos if todo.get('completed', False))
+        total = len(self.todos)
+        completed = self._completed_count
         active = total - completed
         
         return {